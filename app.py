@@ -7,17 +7,45 @@ per studenti, con generazione di gruppi, calendarizzazione e visualizzazione ava
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 import io
 import os
 import re
 import json
+import pickle
+import hashlib
+import collections
+import functools
+import itertools
+import string
+import sys
+import threading
+import atexit
+import uuid
 from io import BytesIO
 import tempfile
 import openpyxl
 
+# orjson è tra le dipendenze; se manca si usa il modulo json della libreria standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# python-calamine è tra le dipendenze e rende molto più veloce la lettura dei file Excel; se manca si usa openpyxl
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+# xlsxwriter è tra le dipendenze; se manca le esportazioni Excel usano openpyxl
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
 # Importa moduli personalizzati
 from ui_components import (create_navbar, section_header, create_preview_card, 
                           show_toast_notification, add_shortcut_buttons,
@@ -29,6 +57,7 @@ from valutazione import valutazione_interface
 from attendance import attendance_interface
 from backup_manager import backup_interface
 from manuale_utente import add_manual_to_ui
+from ricerca_combinazioni import cerca_combinazione_migliore
 
 # Configurazione pagina
 st.set_page_config(
@@ -41,31 +70,148 @@ st.set_page_config(
 # Carica CSS e animazioni
 load_css_animation()
 
-# Verifica se esistono le cartelle necessarie
-if not os.path.exists('temp_files'):
-    os.makedirs('temp_files')
-if not os.path.exists('export'):
-    os.makedirs('export')
+# Verifica se esistono le cartelle necessarie: lo script viene rieseguito a ogni interazione,
+# per cui il controllo è memorizzato con st.cache_resource e avviene una sola volta per processo
+@st.cache_resource(show_spinner=False)
+def prepara_cartelle():
+    for cartella in ('temp_files', 'export'):
+        os.makedirs(cartella, exist_ok=True)
+
+prepara_cartelle()
+
+# File in cui viene salvata la sessione corrente.
+# La sessione è salvata con pickle; il vecchio file JSON viene letto solo se il nuovo non esiste ancora
+FILE_SESSIONE = 'temp_files/sessione.pkl'
+FILE_SESSIONE_JSON = 'temp_files/sessione.json'
+# Versione del formato del file di sessione: dalla 2 le fasce orarie dei laboratori sono già normalizzate
+VERSIONE_SCHEMA_SESSIONE = 2
+# Fasce orarie in cui un laboratorio può essere programmato
+FASCE_ORARIE_DISPONIBILI = (
+    "8:30-11:00",
+    "11:10-13:30",
+    "14:30-17:00",
+    "8:30-13:30",
+    "8:30-17:00"
+)
+# Lettera che identifica ogni canale nei nomi dei gruppi (Canale 1 -> A, Canale 2 -> B, ...)
+LETTERE_CANALI = string.ascii_uppercase
+# Campi di ogni studente, nell'ordine usato per tabelle e salvataggi
+COLONNE_STUDENTI = ["cognome", "nome", "canale"]
+# Fascia configurata nei laboratori -> (fascia usata dallo scheduler, indice dello slot iniziale).
+# Le fasce lunghe partono dal primo slot; "11:00-13:30" è accettata per retrocompatibilità
+FASCE_SCHEDULER = {
+    "8:30-11:00": ("08:30-11:00", 0),
+    "11:00-13:30": ("11:10-13:30", 1),
+    "11:10-13:30": ("11:10-13:30", 1),
+    "14:30-17:00": ("14:30-17:00", 2),
+    "8:30-13:30": ("08:30-13:30", 0),
+    "8:30-17:00": ("08:30-17:00", 0)
+}
+# Slot della giornata coperti da ogni fascia dello scheduler come maschera di bit
+# (1 = mattina 1, 2 = mattina 2, 4 = pomeriggio): le fasce lunghe uniscono i bit degli slot che coprono,
+# così disponibilità e occupazione si verificano/marcano con un solo AND/OR
+SLOT_BITS = {
+    "08:30-11:00": 1,
+    "11:10-13:30": 2,
+    "14:30-17:00": 4,
+    "08:30-13:30": 3,
+    "08:30-17:00": 7
+}
+# Maschera di una giornata interamente occupata (tutti e tre gli slot)
+GIORNATA_PIENA = SLOT_BITS["08:30-17:00"]
+# Ora di inizio e di fine delle fasce dello scheduler (08:30-17:00 comprende la pausa pranzo)
+ORA_INIZIO_FASCIA = {fascia: fascia.split("-")[0] for fascia in SLOT_BITS}
+ORA_FINE_FASCIA = {fascia: fascia.split("-")[1] for fascia in SLOT_BITS}
+# Fasce che coprono un solo slot (nei laboratori brevi l'ora di fine dipende dal minutaggio)
+FASCE_SINGOLE = ("08:30-11:00", "11:10-13:30", "14:30-17:00")
+FASCE_SINGOLE_SET = frozenset(FASCE_SINGOLE)
+# Fasce proposte quando un laboratorio non ne ha configurate, in base alla durata
+FASCE_PREDEFINITE_BREVI = (("08:30-11:00", 0), ("11:10-13:30", 1), ("14:30-17:00", 2))
+FASCE_PREDEFINITE_MEZZA_GIORNATA = (("08:30-13:30", 0),)
+FASCE_PREDEFINITE_GIORNATA = (("08:30-17:00", 0),)
+# Vincolo 1: laboratori che devono essere programmati negli ultimi giorni del periodo
+LABORATORI_ULTIMI_GIORNI = frozenset({"Gestione Terapia", "Gestione Mobilizzazione", "Valutazione Respiratoria", "Valutazione Cardiocircolatoria"})
+# Vincolo 2: laboratori che devono essere programmati nella stessa giornata
+LABORATORI_STESSA_GIORNATA = frozenset({"Mobilizzazione", "Ergonomia"})
+# Aule piccole riservate ai gruppi ridotti anche se la loro capacità è di almeno 15 posti
+AULE_GRUPPI_RIDOTTI = frozenset({"Florence", "Esercitazione 1", "Esercitazione 2", "Aula Piccola"})
 
 # Funzioni di utilità
 def leggi_excel_studenti(file_content):
     """Legge un file Excel con elenco studenti"""
     try:
+        if python_calamine is not None:
+            try:
+                return pd.read_excel(file_content, engine='calamine')
+            except ValueError:
+                # Versioni di pandas precedenti alla 2.2 non conoscono il motore calamine:
+                # si legge il primo foglio direttamente con python-calamine
+                file_content.seek(0)
+                righe = python_calamine.CalamineWorkbook.from_filelike(file_content).get_sheet_by_index(0).to_python()
+                if righe:
+                    return pd.DataFrame(righe[1:], columns=righe[0])
+                return pd.DataFrame()
         df = pd.read_excel(file_content)
         return df
     except Exception as e:
         st.error(f"Errore nella lettura del file Excel: {str(e)}")
         return None
 
-def salva_dati_sessione(trigger_event=None):
-    """Salva i dati della sessione in un file temporaneo"""
-    # Crea la directory temp_files se non esiste
-    if not os.path.exists('temp_files'):
-        os.makedirs('temp_files')
-        
+def codifica_valore_json(valore):
+    """Converte in JSON i tipi non gestiti direttamente; gli altri tipi sono considerati un errore"""
+    if isinstance(valore, (datetime, date)):
+        return valore.isoformat()
+    if isinstance(valore, np.generic):
+        return valore.item()
+    if isinstance(valore, (set, frozenset)):
+        return list(valore)
+    if isinstance(valore, collections.ChainMap):
+        return dict(valore)
+    raise TypeError(f"Tipo non serializzabile in JSON: {type(valore).__name__}")
+
+def serializza_json(dati):
+    """Serializza un dizionario in JSON (bytes UTF-8), usando orjson se disponibile"""
+    if orjson is not None:
+        return orjson.dumps(
+            dati,
+            default=codifica_valore_json,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(dati, ensure_ascii=False, indent=4, default=codifica_valore_json).encode('utf-8')
+
+def deserializza_json(contenuto):
+    """Legge un contenuto JSON (bytes UTF-8), usando orjson se disponibile"""
+    if orjson is not None:
+        return orjson.loads(contenuto)
+    return json.loads(contenuto)
+
+def studenti_a_colonne(studenti):
+    """Trasforma un elenco di studenti in un dizionario di colonne (una lista per campo)"""
+    return {campo: [s.get(campo) for s in studenti] for campo in COLONNE_STUDENTI}
+
+def crea_studente(cognome, nome, canale):
+    """Crea il record di uno studente; cognome e nome sono internati, così le chiavi (cognome, nome)
+    usate per abbinare gli studenti ai gruppi si confrontano per identità invece che carattere per carattere"""
+    if isinstance(cognome, str):
+        cognome = sys.intern(cognome)
+    if isinstance(nome, str):
+        nome = sys.intern(nome)
+    return {"cognome": cognome, "nome": nome, "canale": canale}
+
+def colonne_a_studenti(colonne):
+    """Ricostruisce l'elenco di studenti a partire dal dizionario di colonne"""
+    return [crea_studente(*valori) for valori in zip(*(colonne[campo] for campo in COLONNE_STUDENTI))]
+
+def dati_sessione_correnti():
+    """Raccoglie dallo stato della sessione i dati da salvare o esportare"""
+    # L'elenco completo degli studenti non viene salvato: al caricamento si ricava dai canali.
+    # Gli studenti di ogni canale sono salvati per colonne, senza ripetere i nomi dei campi
     dati_sessione = {
-        "studenti": st.session_state.get("studenti", []),
-        "studenti_per_canale": st.session_state.get("studenti_per_canale", {}),
+        "schema_version": VERSIONE_SCHEMA_SESSIONE,
+        "studenti_per_canale": {
+            canale: studenti_a_colonne(studenti)
+            for canale, studenti in st.session_state.get("studenti_per_canale", {}).items()
+        },
         "laboratori": st.session_state.get("laboratori", []),
         "aule": st.session_state.get("aule", []),
         "date": {
@@ -76,7 +222,6 @@ def salva_dati_sessione(trigger_event=None):
         "gruppi_ridotti": st.session_state.get("gruppi_ridotti", {}),
         "gruppi_standard_per_canale": st.session_state.get("gruppi_standard_per_canale", {}),
         "gruppi_ridotti_per_canale": st.session_state.get("gruppi_ridotti_per_canale", {}),
-        "programmazione": st.session_state.get("programmazione", []),
         "programmazione_per_canale": st.session_state.get("programmazione_per_canale", {}),
         # Configurazione avanzata
         "sede_cdl": st.session_state.get("sede_selezionata", ""),
@@ -84,10 +229,142 @@ def salva_dati_sessione(trigger_event=None):
         "anno_corso": st.session_state.get("anno_corso", "1"),
         "anno_accademico": st.session_state.get("anno_accademico", "")
     }
+    return dati_sessione
+
+@st.cache_resource(show_spinner=False)
+def scrittore_sessione():
+    """Avvia (una volta per processo) il thread che scrive il file di sessione e restituisce lo stato condiviso.
+    Ogni sessione del browser ha il proprio contenuto in coda, il proprio ultimo contenuto scritto e l'eventuale
+    errore della sua ultima scrittura: le sessioni contemporanee non si sostituiscono i salvataggi a vicenda.
+    I contenuti ancora in coda vengono scritti anche alla chiusura del processo"""
+    stato = {
+        "condizione": threading.Condition(),
+        "scrittura": threading.Lock(),
+        "sessioni": {},          # id sessione -> stato delle scritture di quella sessione
+        "numero": 0,             # numero progressivo dei contenuti consegnati (per tutte le sessioni)
+        "numero_file": 0         # numero dell'ultimo contenuto scritto su file
+    }
     
+    def prendi_contenuti():
+        # Contenuti in coda di tutte le sessioni, nell'ordine in cui sono stati consegnati
+        with stato["condizione"]:
+            in_coda = [
+                (id_sessione,) + sessione["contenuto"]
+                for id_sessione, sessione in stato["sessioni"].items()
+                if sessione["contenuto"] is not None
+            ]
+            for sessione in stato["sessioni"].values():
+                sessione["contenuto"] = None
+        return sorted(in_coda, key=lambda elemento: elemento[1])
+    
+    def scrivi(in_coda):
+        id_sessione, numero, hash_dati, contenuto = in_coda
+        sessione = stato["sessioni"][id_sessione]
+        with stato["scrittura"]:
+            # Un contenuto più recente della stessa sessione può essere già stato scritto (ad esempio alla chiusura)
+            if numero <= sessione["numero_scritto"]:
+                return
+            try:
+                # Scrittura su file temporaneo e sostituzione atomica: il file non resta mai a metà
+                file_temporaneo = FILE_SESSIONE + '.tmp'
+                with open(file_temporaneo, 'wb') as f:
+                    f.write(contenuto)
+                os.replace(file_temporaneo, FILE_SESSIONE)
+            except OSError as e:
+                # L'errore resta nello stato della sessione e viene mostrato al rerun successivo
+                errore = str(e)
+            else:
+                errore = None
+            with stato["condizione"]:
+                if errore is None:
+                    sessione["numero_scritto"] = numero
+                    sessione["hash_scritto"] = hash_dati
+                    stato["numero_file"] = numero
+                sessione["errore"] = errore
+                # Il contenuto non è più in coda: se la scrittura è fallita il prossimo salvataggio la ritenta
+                if sessione["hash_in_coda"] == hash_dati and sessione["contenuto"] is None:
+                    sessione["hash_in_coda"] = None
+            if errore is not None:
+                return
+        # Solo ora il file è cambiato: le letture memorizzate non servono più
+        leggi_file_sessione.clear()
+    
+    def scrivi_in_background():
+        while True:
+            with stato["condizione"]:
+                while not any(sessione["contenuto"] is not None for sessione in stato["sessioni"].values()):
+                    stato["condizione"].wait()
+            # Per ogni sessione si scrive solo l'ultimo contenuto ricevuto: i suoi salvataggi ravvicinati vengono accorpati
+            for in_coda in prendi_contenuti():
+                scrivi(in_coda)
+    
+    def scrivi_alla_chiusura():
+        # Il thread è daemon: i contenuti ancora in coda verrebbero persi all'uscita del processo
+        for in_coda in prendi_contenuti():
+            scrivi(in_coda)
+    
+    threading.Thread(target=scrivi_in_background, daemon=True).start()
+    atexit.register(scrivi_alla_chiusura)
+    return stato
+
+def id_sessione_corrente():
+    """Identificativo della sessione del browser, usato per tenere separate le scritture delle sessioni"""
+    if 'id_sessione' not in st.session_state:
+        st.session_state.id_sessione = uuid.uuid4().hex
+    return st.session_state.id_sessione
+
+def stato_scritture_sessione(stato, id_sessione):
+    """Stato delle scritture di una sessione nello stato condiviso (da usare con la condizione acquisita)"""
+    return stato["sessioni"].setdefault(id_sessione, {
+        "contenuto": None,       # (numero, hash, contenuto) in attesa di essere scritto
+        "hash_in_coda": None,
+        "numero": 0,             # ultimo numero consegnato dalla sessione
+        "numero_scritto": 0,     # ultimo numero della sessione scritto su file
+        "hash_scritto": None,
+        "errore": None
+    })
+
+def accoda_scrittura_sessione(contenuto, hash_dati):
+    """Consegna al thread di scrittura il contenuto serializzato della sessione corrente"""
+    stato = scrittore_sessione()
+    id_sessione = id_sessione_corrente()
+    with stato["condizione"]:
+        sessione = stato_scritture_sessione(stato, id_sessione)
+        stato["numero"] += 1
+        sessione["numero"] = stato["numero"]
+        sessione["contenuto"] = (stato["numero"], hash_dati, contenuto)
+        sessione["hash_in_coda"] = hash_dati
+        stato["condizione"].notify()
+
+def errore_salvataggio_sessione():
+    """Messaggio dell'ultima scrittura non riuscita della sessione corrente (None se l'ultima è andata a buon fine)"""
+    stato = scrittore_sessione()
+    with stato["condizione"]:
+        sessione = stato["sessioni"].get(id_sessione_corrente())
+        return sessione["errore"] if sessione else None
+
+def salva_dati_sessione(trigger_event=None):
+    """Salva i dati della sessione in un file temporaneo"""
     try:
-        with open('temp_files/sessione.json', 'w', encoding='utf-8') as f:
-            json.dump(dati_sessione, f, ensure_ascii=False, indent=4, default=str)
+        contenuto = pickle.dumps(dati_sessione_correnti(), protocol=pickle.HIGHEST_PROTOCOL)
+        
+        # Se i dati sono già su file (e nessun'altra sessione lo ha riscritto nel frattempo),
+        # o in coda per esserlo, non riscrive il file
+        hash_dati = hashlib.blake2b(contenuto, digest_size=16).digest()
+        stato = scrittore_sessione()
+        with stato["condizione"]:
+            sessione = stato_scritture_sessione(stato, id_sessione_corrente())
+            gia_salvati = (
+                (sessione["numero_scritto"] == sessione["numero"] == stato["numero_file"]
+                 and sessione["hash_scritto"] == hash_dati and os.path.exists(FILE_SESSIONE)) or
+                sessione["hash_in_coda"] == hash_dati
+            )
+        if gia_salvati:
+            return True
+        
+        # La scrittura su disco avviene in background: l'interfaccia non attende l'I/O.
+        # L'esito viene registrato dal thread di scrittura (vedi errore_salvataggio_sessione)
+        accoda_scrittura_sessione(contenuto, hash_dati)
         return True
     except Exception as e:
         st.error(f"Errore nel salvataggio dei dati: {str(e)}")
@@ -106,12 +383,36 @@ def normalizza_fasce_orarie(lab):
         lab["fasce_orarie_disponibili"] = fasce_normalizzate
     return lab
 
+def ripristina_chiavi_canale(dati):
+    """In JSON le chiavi dei dizionari per canale diventano stringhe: le riporta a numeri interi"""
+    for chiave in ("studenti_per_canale", "gruppi_standard_per_canale", "gruppi_ridotti_per_canale", "programmazione_per_canale"):
+        if isinstance(dati.get(chiave), dict):
+            dati[chiave] = {
+                int(canale) if isinstance(canale, str) and canale.isdigit() else canale: valore
+                for canale, valore in dati[chiave].items()
+            }
+    return dati
+
+@st.cache_data(show_spinner=False)
+def leggi_file_sessione(percorso, mtime):
+    """Legge il file di sessione; il risultato resta in cache finché non cambia la data di modifica"""
+    with open(percorso, 'rb') as f:
+        if percorso.endswith('.json'):
+            return ripristina_chiavi_canale(deserializza_json(f.read()))
+        return pickle.load(f)
+
 def carica_dati_sessione():
     """Carica i dati della sessione da un file temporaneo"""
+    # Il ripristino avviene una sola volta per sessione: ai rerun successivi
+    # i dati sono già in st.session_state e ogni modifica viene salvata su file
+    if st.session_state.get('sessione_caricata'):
+        return
+    st.session_state.sessione_caricata = True
+    
     try:
-        if os.path.exists('temp_files/sessione.json'):
-            with open('temp_files/sessione.json', 'r', encoding='utf-8') as f:
-                dati = json.load(f)
+        percorso = FILE_SESSIONE if os.path.exists(FILE_SESSIONE) else FILE_SESSIONE_JSON
+        if os.path.exists(percorso):
+            dati = leggi_file_sessione(percorso, os.path.getmtime(percorso))
                 
             # Ripristina gli stati della sessione
             if "studenti" in dati and isinstance(dati["studenti"], list):
@@ -119,7 +420,11 @@ def carica_dati_sessione():
                 
             # Carica la struttura degli studenti per canale, se presente
             if "studenti_per_canale" in dati and isinstance(dati["studenti_per_canale"], dict):
-                st.session_state.studenti_per_canale = dati["studenti_per_canale"]
+                # I file recenti salvano ogni canale per colonne, quelli vecchi come elenco di record
+                st.session_state.studenti_per_canale = {
+                    canale: colonne_a_studenti(studenti) if isinstance(studenti, dict) else studenti
+                    for canale, studenti in dati["studenti_per_canale"].items()
+                }
             else:
                 # Se non c'è la struttura per canale ma ci sono studenti, creala
                 if "studenti" in dati and isinstance(dati["studenti"], list) and dati["studenti"]:
@@ -133,9 +438,18 @@ def carica_dati_sessione():
                     
                     # Metti tutti gli studenti nel primo canale
                     st.session_state.studenti_per_canale[1] = dati["studenti"].copy()
+            
+            # I salvataggi recenti contengono solo gli studenti per canale
+            if "studenti" not in dati and "studenti_per_canale" in dati:
+                st.session_state.studenti = appiattisci_studenti()
+            # I file salvati prima della versione 2 vanno migrati una volta sola
+            migrazione_necessaria = dati.get("schema_version", 1) < VERSIONE_SCHEMA_SESSIONE
             if "laboratori" in dati and isinstance(dati["laboratori"], list):
-                # Normalizza le fasce orarie nei laboratori esistenti per compatibilità
-                st.session_state.laboratori = [normalizza_fasce_orarie(lab) for lab in dati["laboratori"]]
+                if migrazione_necessaria:
+                    # Normalizza le fasce orarie nei laboratori esistenti per compatibilità
+                    st.session_state.laboratori = [normalizza_fasce_orarie(lab) for lab in dati["laboratori"]]
+                else:
+                    st.session_state.laboratori = dati["laboratori"]
             if "aule" in dati and isinstance(dati["aule"], list):
                 st.session_state.aule = dati["aule"]
             if "date" in dati and isinstance(dati["date"], dict):
@@ -152,12 +466,16 @@ def carica_dati_sessione():
             if "gruppi_ridotti_per_canale" in dati and isinstance(dati["gruppi_ridotti_per_canale"], dict):
                 st.session_state.gruppi_ridotti_per_canale = dati["gruppi_ridotti_per_canale"]
                 
+            # I file precedenti ai canali contengono solo la programmazione globale (viene poi portata nel Canale 1)
             if "programmazione" in dati and isinstance(dati["programmazione"], list):
                 st.session_state.programmazione = dati["programmazione"]
                 
-            # Carica la programmazione per canale se disponibile
+            # Carica la programmazione per canale se disponibile: è l'unica copia degli eventi,
+            # la programmazione globale ne è la vista complessiva
             if "programmazione_per_canale" in dati and isinstance(dati["programmazione_per_canale"], dict):
                 st.session_state.programmazione_per_canale = dati["programmazione_per_canale"]
+                if any(dati["programmazione_per_canale"].values()):
+                    sincronizza_programmazione()
             
             # Carica configurazione avanzata
             if "sede_cdl" in dati:
@@ -168,22 +486,32 @@ def carica_dati_sessione():
                 st.session_state.anno_corso = dati["anno_corso"]
             if "anno_accademico" in dati:
                 st.session_state.anno_accademico = dati["anno_accademico"]
+            
+            # Riscrive il file nel formato corrente così la migrazione non si ripete
+            if migrazione_necessaria or percorso != FILE_SESSIONE:
+                salva_dati_sessione()
     except Exception as e:
         st.error(f"Errore nel caricamento dei dati: {str(e)}")
 
+# Formato delle date italiane (gg/mm/aaaa), compilato una sola volta
+REGEX_DATA_ITALIANA = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+@functools.lru_cache(maxsize=256)
 def converti_data_italiana(data_str):
     """Converte una data dal formato italiano (gg/mm/aaaa) a oggetto datetime"""
     try:
         if data_str and isinstance(data_str, str):
-            return datetime.strptime(data_str, "%d/%m/%Y")
+            corrispondenza = REGEX_DATA_ITALIANA.match(data_str.strip())
+            if corrispondenza:
+                giorno, mese, anno = corrispondenza.groups()
+                return datetime(int(anno), int(mese), int(giorno))
         return None
     except Exception:
         return None
 
+@st.cache_data(show_spinner=False)
 def crea_giorni_lavorativi(data_inizio, data_fine):
-    """Crea un elenco di date lavorative (lunedì-venerdì) tra due date"""
-    giorni = []
-    
+    """Crea un elenco di date lavorative (lunedì-venerdì) tra due date; il risultato è memorizzato per periodo"""
     # Verifica che le date siano oggetti datetime, altrimenti convertile
     if isinstance(data_inizio, str):
         data_inizio = converti_data_italiana(data_inizio)
@@ -194,30 +522,440 @@ def crea_giorni_lavorativi(data_inizio, data_fine):
     if not data_inizio or not data_fine:
         return []
     
-    data_corrente = data_inizio
+    # bdate_range genera direttamente i giorni lunedì-venerdì dell'intervallo
+    return pd.bdate_range(start=data_inizio, end=data_fine).to_pydatetime().tolist()
+
+@st.cache_data(show_spinner=False)
+def date_lavorative_disponibili(data_inizio, data_fine):
+    """Restituisce i giorni lavorativi del periodo come stringhe gg/mm/aaaa, calcolati una volta per periodo"""
+    giorni_lavorativi = pd.DatetimeIndex(crea_giorni_lavorativi(data_inizio, data_fine))
+    return giorni_lavorativi.strftime("%d/%m/%Y").tolist()
+
+@st.cache_data(show_spinner=False)
+def tabella_calendario(data_inizio, data_fine):
+    """Costruisce il calendario dei giorni lavorativi (data e nome del giorno), calcolato una volta per periodo"""
+    giorni_lavorativi = pd.DatetimeIndex(crea_giorni_lavorativi(data_inizio, data_fine))
+    return pd.DataFrame({
+        "Data": giorni_lavorativi.strftime("%d/%m/%Y"),
+        "Giorno": giorni_lavorativi.strftime("%A"),
+    })
+
+def numero_giorni_lavorativi(data_inizio, data_fine):
+    """Conta i giorni lavorativi (lunedì-venerdì) tra due date, estremi inclusi, senza creare l'elenco"""
+    if isinstance(data_inizio, str):
+        data_inizio = converti_data_italiana(data_inizio)
+    if isinstance(data_fine, str):
+        data_fine = converti_data_italiana(data_fine)
+    
+    if not data_inizio or not data_fine or data_inizio > data_fine:
+        return 0
+    
+    # busday_count esclude l'ultimo giorno: si sposta la fine al giorno successivo
+    return int(np.busday_count(data_inizio.date(), data_fine.date() + timedelta(days=1)))
+
+@functools.lru_cache(maxsize=None)
+def opzioni_canali(num_canali):
+    """Etichette dei canali per le selectbox, associate al numero del canale (da non modificare: il dizionario è condiviso)"""
+    return {f"Canale {i}": i for i in range(1, num_canali + 1)}
+
+def appiattisci_studenti():
+    """Restituisce l'elenco completo degli studenti concatenando quelli di tutti i canali"""
+    return list(itertools.chain.from_iterable(st.session_state.studenti_per_canale.values()))
+
+@st.cache_data(show_spinner=False)
+def tabella_studenti(righe_studenti):
+    """Costruisce il DataFrame di un elenco studenti; viene ricalcolato solo quando l'elenco cambia"""
+    return pd.DataFrame(list(righe_studenti), columns=COLONNE_STUDENTI)
+
+def righe_studenti(studenti):
+    """Converte un elenco di studenti in una tupla hashabile da usare come chiave di cache"""
+    return tuple((s.get("cognome", ""), s.get("nome", ""), s.get("canale")) for s in studenti)
+
+def tabella_eventi_pdf(eventi, colonne_chiave):
+    """Prepara gli eventi programmati con le colonne usate dall'esportazione PDF dei gruppi"""
+    df_eventi = pd.DataFrame(eventi).reindex(
+        columns=list(colonne_chiave) + ["data", "ora_inizio", "ora_fine", "laboratorio", "aula"]
+    ).fillna("")
+    df_eventi["orario"] = df_eventi["ora_inizio"].astype(str) + "-" + df_eventi["ora_fine"].astype(str)
+    return df_eventi.rename(columns={"laboratorio": "nome"})
+
+def programmazione_complessiva():
+    """Eventi di tutti i canali in un unico elenco, nell'ordine dei canali (gli eventi non vengono copiati)"""
+    return list(itertools.chain.from_iterable(st.session_state.programmazione_per_canale.values()))
+
+def sincronizza_programmazione():
+    """Ricalcola st.session_state.programmazione, la vista globale usata dai moduli che non gestiscono i canali"""
+    st.session_state.programmazione = programmazione_complessiva()
+    # Riferimento alla vista calcolata: se la programmazione globale viene sostituita da altro
+    # (caricamento di una sessione o ripristino di un backup) adotta_programmazione_globale() se ne accorge
+    st.session_state.vista_programmazione = st.session_state.programmazione
+    # La programmazione è cambiata: i DataFrame visualizzati vanno ricostruiti
+    invalida_dataframe_programmazione()
+
+def adotta_programmazione_globale():
+    """Porta nei canali una programmazione globale che non corrisponde a quella dei canali (sessioni o backup
+    precedenti ai canali, ripristini che contengono solo la programmazione globale). Gli eventi vanno nel
+    loro canale (Canale 1 se non indicato) e la sessione viene salvata"""
+    programmazione = st.session_state.programmazione
+    if programmazione is st.session_state.get('vista_programmazione'):
+        return
+    if programmazione != programmazione_complessiva():
+        programmazione_per_canale = {}
+        for evento in programmazione:
+            programmazione_per_canale.setdefault(evento.get("canale", 1), []).append(evento)
+        st.session_state.programmazione_per_canale = programmazione_per_canale
+        sincronizza_programmazione()
+        salva_dati_sessione()
+    else:
+        st.session_state.vista_programmazione = programmazione
+
+@st.cache_data(show_spinner=False)
+def raggruppa_laboratori_per_gruppo(programmazione):
+    """Raggruppa gli eventi programmati per gruppo nel formato usato dall'esportazione PDF dei gruppi"""
+    if not programmazione:
+        return {}
+    
+    df_eventi = tabella_eventi_pdf(programmazione, ["gruppo"])
+    
+    # sort=False mantiene i gruppi nell'ordine in cui compaiono nella programmazione
+    return {
+        gruppo: eventi_gruppo[["data", "orario", "nome", "aula"]].to_dict("records")
+        for gruppo, eventi_gruppo in df_eventi.groupby("gruppo", sort=False)
+    }
+
+@st.cache_data(show_spinner=False)
+def raggruppa_laboratori_per_canale(programmazione_per_canale):
+    """Come raggruppa_laboratori_per_gruppo, ma per tutti i canali in un solo passaggio: {canale: {gruppo: eventi}}"""
+    eventi = [
+        {**evento, "canale": canale}
+        for canale, eventi_canale in programmazione_per_canale.items()
+        for evento in eventi_canale
+    ]
+    if not eventi:
+        return {}
+    
+    df_eventi = tabella_eventi_pdf(eventi, ["canale", "gruppo"])
+    
+    laboratori_per_canale = collections.defaultdict(dict)
+    for (canale, gruppo), eventi_gruppo in df_eventi.groupby(["canale", "gruppo"], sort=False):
+        laboratori_per_canale[canale][gruppo] = eventi_gruppo[["data", "orario", "nome", "aula"]].to_dict("records")
+    return dict(laboratori_per_canale)
+
+@st.cache_data(max_entries=32, ttl=3600, show_spinner=False)
+def genera_pdf_gruppi(gruppi, laboratori_per_gruppo, sede_cdl=None, anno_corso=None, anno_accademico=None):
+    """Genera il PDF dei gruppi; con gli stessi gruppi e laboratori restituisce il PDF già generato"""
+    pdf = export_student_groups_pdf(
+        gruppi,
+        laboratori_per_gruppo,
+        sede_cdl=sede_cdl,
+        anno_corso=anno_corso,
+        anno_accademico=anno_accademico
+    )
+    # In cache si conservano solo i byte del file, non il buffer usato per generarlo
+    return pdf.getvalue() if hasattr(pdf, 'getvalue') else pdf
+
+def pdf_singolo_gruppo(nome_gruppo, studenti, laboratori_tutti_gruppi, intestazione_pdf):
+    """PDF di un solo gruppo con i laboratori che gli sono stati programmati"""
+    laboratori_gruppo = laboratori_tutti_gruppi.get(nome_gruppo)
+    laboratori_per_gruppo = {nome_gruppo: laboratori_gruppo} if laboratori_gruppo is not None else {}
+    return genera_pdf_gruppi({nome_gruppo: studenti}, laboratori_per_gruppo, *intestazione_pdf)
+
+@st.cache_data(show_spinner=False)
+def tabella_gruppi(gruppi):
+    """Costruisce un unico DataFrame con gli studenti di tutti i gruppi e la colonna del gruppo di appartenenza"""
+    studenti = [studente for studenti_gruppo in gruppi.values() for studente in studenti_gruppo]
+    colonne = {"gruppo": [nome_gruppo for nome_gruppo, studenti_gruppo in gruppi.items() for _ in studenti_gruppo]}
+    colonne.update(studenti_a_colonne(studenti))
+    return pd.DataFrame(colonne, copy=False)
+
+def appiattisci_gruppi(gruppi_per_canale):
+    """Vista unica sui gruppi di tutti i canali, senza copiarli (i nomi dei gruppi sono unici tra i canali)"""
+    # ChainMap elenca le chiavi partendo dall'ultima mappa: invertendo l'ordine i gruppi seguono l'ordine dei canali
+    return collections.ChainMap(*reversed(list(gruppi_per_canale.values())))
+
+@st.cache_data(show_spinner=False)
+def gruppo_per_studente(gruppi):
+    """Indice (cognome, nome) -> nome del gruppo; se uno studente compare in più gruppi vale l'ultimo"""
+    return {
+        (studente["cognome"], studente["nome"]): nome_gruppo
+        for nome_gruppo, studenti in gruppi.items()
+        for studente in studenti
+    }
+
+def dividi_in_gruppi(studenti, nomi_gruppi):
+    """Distribuisce equamente gli studenti nei gruppi; se la divisione non è esatta i primi gruppi hanno uno studente in più"""
+    blocchi = np.array_split(np.array(studenti, dtype=object), len(nomi_gruppi))
+    return {nome: blocco.tolist() for nome, blocco in zip(nomi_gruppi, blocchi)}
+
+def laboratori_per_nome():
+    """Indice nome -> laboratorio (con la posizione di ogni laboratorio nell'elenco). Viene ricostruito se l'elenco dei laboratori è stato sostituito (caricamento,
+    ripristino, reset) o dopo invalida_indice_laboratori(), da chiamare a ogni aggiunta o rimozione in place"""
+    laboratori = st.session_state.laboratori
+    # L'indice conserva un riferimento all'elenco da cui è stato costruito: il confronto per identità
+    # non può essere ingannato dal riuso dell'indirizzo di un elenco liberato
+    if st.session_state.get('origine_laboratori_per_nome') is not laboratori:
+        st.session_state.laboratori_per_nome = {lab["nome"]: lab for lab in laboratori}
+        st.session_state.nomi_laboratori = list(st.session_state.laboratori_per_nome)
+        # Posizione nell'elenco di ogni laboratorio dell'indice (con nomi ripetuti vale l'ultimo, come nell'indice)
+        st.session_state.posizioni_laboratori = {lab["nome"]: posizione for posizione, lab in enumerate(laboratori)}
+        st.session_state.origine_laboratori_per_nome = laboratori
+    return st.session_state.laboratori_per_nome
+
+def invalida_indice_laboratori():
+    """Scarta l'indice per nome dei laboratori (e l'elenco dei nomi) dopo una modifica in place dell'elenco"""
+    st.session_state.pop('origine_laboratori_per_nome', None)
+
+def posizione_laboratorio(nome):
+    """Posizione nell'elenco dei laboratori del laboratorio con questo nome (None se non esiste)"""
+    laboratori_per_nome()
+    return st.session_state.posizioni_laboratori.get(nome)
+
+def nomi_laboratori():
+    """Nomi dei laboratori configurati, nell'ordine di inserimento; aggiornati insieme all'indice per nome"""
+    laboratori_per_nome()
+    return st.session_state.nomi_laboratori
+
+def aule_per_nome():
+    """Indice nome -> aula (con la posizione di ogni aula nell'elenco). Viene ricostruito se l'elenco delle aule è stato sostituito (caricamento,
+    ripristino, reset) o dopo invalida_indice_aule(), da chiamare a ogni aggiunta o rimozione in place"""
+    aule = st.session_state.aule
+    # Come per i laboratori, il riferimento all'elenco di origine rende sicuro il confronto per identità
+    if st.session_state.get('origine_aule_per_nome') is not aule:
+        st.session_state.aule_per_nome = {aula["nome"]: aula for aula in aule}
+        st.session_state.nomi_aule = list(st.session_state.aule_per_nome)
+        st.session_state.posizioni_aule = {aula["nome"]: posizione for posizione, aula in enumerate(aule)}
+        st.session_state.origine_aule_per_nome = aule
+    return st.session_state.aule_per_nome
+
+def invalida_indice_aule():
+    """Scarta l'indice per nome delle aule (e l'elenco dei nomi) dopo una modifica in place dell'elenco"""
+    st.session_state.pop('origine_aule_per_nome', None)
+
+def posizione_aula(nome):
+    """Posizione nell'elenco delle aule dell'aula con questo nome (None se non esiste)"""
+    aule_per_nome()
+    return st.session_state.posizioni_aule.get(nome)
+
+def nomi_aule():
+    """Nomi delle aule configurate, nell'ordine di inserimento; aggiornati insieme all'indice per nome"""
+    aule_per_nome()
+    return st.session_state.nomi_aule
+
+def dataframe_programmazione(chiave, eventi):
+    """DataFrame degli eventi da visualizzare, con la colonna evento_id usata per l'eliminazione.
+    Ogni elenco (un canale o la vista globale) ha la sua voce in cache, ricostruita se l'elenco è stato
+    sostituito o dopo invalida_dataframe_programmazione()"""
+    cache = st.session_state.setdefault('dataframe_programmazione', {})
+    origine, df_programmazione = cache.get(chiave, (None, None))
+    # La voce conserva l'elenco di origine: il confronto per identità non può confondere elenchi diversi
+    if origine is not eventi:
+        df_programmazione = pd.DataFrame(eventi)
+        if not df_programmazione.empty:
+            # Chiave univoca per ogni evento
+            df_programmazione["evento_id"] = df_programmazione.apply(
+                lambda row: f"{row['data']} - {row['ora_inizio']} - {row['laboratorio']} - {row['aula']} - {row['gruppo']}",
+                axis=1
+            )
+        cache[chiave] = (eventi, df_programmazione)
+    return df_programmazione
+
+def invalida_dataframe_programmazione():
+    """Scarta i DataFrame della programmazione in cache (dopo generazione, cancellazione o eliminazione di eventi)"""
+    st.session_state.pop('dataframe_programmazione', None)
+
+def classifica_laboratori(laboratori):
+    """Divide i laboratori per tipo di gruppo, ordinati dal più lungo al più breve.
+    Un laboratorio senza tipo di gruppo valido viene trattato come 'standard' e restituito anche nel terzo
+    elenco, come coppia (laboratorio, tipo_gruppo originale); i laboratori non vengono modificati"""
+    labs_standard = []
+    labs_ridotti = []
+    labs_da_correggere = []
+    for lab in laboratori:
+        tipo_gruppo = lab.get("tipo_gruppo")
+        if tipo_gruppo == "ridotto":
+            labs_ridotti.append(lab)
+        else:
+            if tipo_gruppo != "standard":
+                labs_da_correggere.append((lab, tipo_gruppo))
+            labs_standard.append(lab)
+    labs_standard.sort(key=lambda x: x["minutaggio"], reverse=True)
+    labs_ridotti.sort(key=lambda x: x["minutaggio"], reverse=True)
+    return labs_standard, labs_ridotti, labs_da_correggere
+
+def laboratori_classificati():
+    """Laboratori divisi per tipo di gruppo (vedi classifica_laboratori), conservati nello stato della sessione.
+    Come l'indice per nome, la suddivisione viene ricalcolata se l'elenco dei laboratori è stato sostituito
+    o dopo invalida_laboratori_classificati(), da chiamare a ogni aggiunta, modifica o rimozione in place"""
+    laboratori = st.session_state.laboratori
+    if st.session_state.get('origine_laboratori_classificati') is not laboratori:
+        st.session_state.laboratori_classificati = classifica_laboratori(laboratori)
+        st.session_state.origine_laboratori_classificati = laboratori
+    return st.session_state.laboratori_classificati
+
+def invalida_laboratori_classificati():
+    """Scarta la suddivisione dei laboratori per tipo di gruppo dopo una modifica in place"""
+    st.session_state.pop('origine_laboratori_classificati', None)
+
+def classifica_aule(aule):
+    """Divide le aule tra gruppi standard (capacità >= 15) e ridotti (capacità < 15 o aule piccole note)"""
+    # Un solo passaggio: un'aula grande con nome riservato va in entrambi gli elenchi
+    aule_standard = []
+    aule_ridotte = []
+    for aula in aule:
+        if aula["capacita"] >= 15:
+            aule_standard.append(aula)
+            if aula["nome"] in AULE_GRUPPI_RIDOTTI:
+                aule_ridotte.append(aula)
+        else:
+            aule_ridotte.append(aula)
+    return aule_standard, aule_ridotte
+
+@st.cache_data(show_spinner=False)
+def tabella_laboratori(laboratori):
+    """Costruisce il DataFrame dei laboratori configurati; viene ricalcolato solo quando i laboratori cambiano"""
+    df_laboratori = pd.DataFrame(laboratori)
+    df_laboratori.index = df_laboratori.index + 1  # Inizia da 1 invece che da 0
+    return df_laboratori
+
+def chiave_laboratori():
+    """Riassume i laboratori nei campi usati per suddividerli per tipo di gruppo (chiave di cache)"""
+    return tuple(
+        (lab["nome"], lab["tipo_gruppo"], lab["min_studenti"], lab["max_studenti"])
+        for lab in st.session_state.laboratori
+    )
+
+@st.cache_data(show_spinner=False)
+def limiti_studenti_per_tipo(laboratori):
+    """Suddivide i laboratori per tipo di gruppo e restituisce, per ogni tipo, il minimo e il massimo di studenti"""
+    limiti = {}
+    for _, tipo_gruppo, min_studenti, max_studenti in laboratori:
+        if tipo_gruppo in limiti:
+            minimo, massimo = limiti[tipo_gruppo]
+            limiti[tipo_gruppo] = (min(minimo, min_studenti), max(massimo, max_studenti))
+        else:
+            limiti[tipo_gruppo] = (min_studenti, max_studenti)
+    return limiti
+
+@st.cache_data(show_spinner=False)
+def calcola_riepilogo_home(conteggi):
+    """Prepara le righe del riepilogo della Home a partire dai conteggi della sessione"""
+    righe_dati = []
+    righe_statistiche = []
+    
+    # Totale degli studenti (per retrocompatibilità) e studenti per canale
+    righe_dati.append(f"Studenti totali: {conteggi['studenti']}")
+    for canale, n_studenti in conteggi["studenti_per_canale"]:
+        righe_dati.append(f"Studenti Canale {canale}: {n_studenti}")
+    
+    righe_dati.append(f"Laboratori: {conteggi['laboratori']}")
+    righe_dati.append(f"Aule: {conteggi['aule']}")
+    righe_dati.append(f"Canali configurati: {conteggi['num_canali']}")
+    
+    if conteggi["data_inizio"] and conteggi["data_fine"]:
+        data_inizio = converti_data_italiana(conteggi["data_inizio"])
+        data_fine = converti_data_italiana(conteggi["data_fine"])
+        if data_inizio and data_fine:
+            righe_dati.append(f"Periodo: dal {conteggi['data_inizio']} al {conteggi['data_fine']}")
+            righe_dati.append(f"Giorni lavorativi: {numero_giorni_lavorativi(data_inizio, data_fine)}")
+    
+    # Gruppi per canale, altrimenti i totali (per retrocompatibilità)
+    if conteggi["gruppi_standard_per_canale"]:
+        for canale, n_gruppi in conteggi["gruppi_standard_per_canale"]:
+            righe_statistiche.append(f"Gruppi Standard Canale {canale}: {n_gruppi}")
+    else:
+        righe_statistiche.append(f"Gruppi Standard totali: {conteggi['gruppi_standard']}")
+    
+    if conteggi["gruppi_ridotti_per_canale"]:
+        for canale, n_gruppi in conteggi["gruppi_ridotti_per_canale"]:
+            righe_statistiche.append(f"Gruppi Ridotti Canale {canale}: {n_gruppi}")
+    else:
+        righe_statistiche.append(f"Gruppi a Capacità Ridotta totali: {conteggi['gruppi_ridotti']}")
     
-    while data_corrente <= data_fine:
-        # 0 = lunedì, 6 = domenica
-        if data_corrente.weekday() < 5:  # Lunedì-Venerdì
-            giorni.append(data_corrente)
-        data_corrente += timedelta(days=1)
+    # Eventi programmati per canale
+    if conteggi["programmazione_per_canale"]:
+        for canale, n_eventi in conteggi["programmazione_per_canale"]:
+            righe_statistiche.append(f"Eventi programmati Canale {canale}: {n_eventi}")
+    else:
+        righe_statistiche.append(f"Eventi programmati totali: {conteggi['programmazione']}")
     
-    return giorni
+    return righe_dati, righe_statistiche
 
 def calcola_fascia_oraria(ora_inizio, durata_minuti):
     """Calcola la fascia oraria di fine dato orario inizio e durata in minuti"""
-    ora_inizio_dt = datetime.strptime(ora_inizio, "%H:%M")
-    ora_fine_dt = ora_inizio_dt + timedelta(minutes=durata_minuti)
-    return ora_fine_dt.strftime("%H:%M")
+    ore, minuti = ora_inizio.split(":")
+    # Minuti dalla mezzanotte, riportati nelle 24 ore come faceva il calcolo con datetime
+    minuti_fine = (int(ore) * 60 + int(minuti) + int(durata_minuti)) % (24 * 60)
+    return f"{minuti_fine // 60:02d}:{minuti_fine % 60:02d}"
+
 
+def crea_excel_writer(output):
+    """Crea un ExcelWriter su output, preferendo xlsxwriter a openpyxl"""
+    if xlsxwriter is not None:
+        # Nessuna conversione automatica di URL/formule: le celle sono scritte come testo semplice
+        return pd.ExcelWriter(
+            output,
+            engine='xlsxwriter',
+            engine_kwargs={'options': {'strings_to_urls': False, 'strings_to_formulas': False}}
+        )
+    return pd.ExcelWriter(output, engine='openpyxl')
+
+@st.cache_data(show_spinner=False)
 def converti_a_excel(df):
-    """Converte un DataFrame in file Excel"""
+    """Converte un DataFrame in file Excel; il file viene rigenerato solo se cambiano i dati"""
+    output = BytesIO()
+    if xlsxwriter is None:
+        writer = crea_excel_writer(output)
+        df.to_excel(writer, index=False, sheet_name='Programmazione')
+        writer.close()
+        return output.getvalue()
+    
+    # Con xlsxwriter le righe vengono scritte una alla volta in modalità constant_memory:
+    # ogni riga completata viene scaricata su disco e la memoria resta costante al crescere dei dati.
+    # Questa modalità richiede di scrivere per righe, quindi non si passa da DataFrame.to_excel
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+        'default_date_format': 'dd/mm/yyyy'
+    })
+    worksheet = workbook.add_worksheet('Programmazione')
+    formato_intestazione = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    worksheet.write_row(0, 0, [str(colonna) for colonna in df.columns], formato_intestazione)
+    # Valori Python nativi, con le celle mancanti lasciate vuote come fa to_excel
+    righe = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    for indice_riga, riga in enumerate(righe, start=1):
+        worksheet.write_row(indice_riga, 0, riga)
+    workbook.close()
+    return output.getvalue()
+
+@st.cache_data(show_spinner=False)
+def converti_canali_a_excel(righe_per_canale):
+    """Crea un unico file Excel con un foglio per ogni canale a partire dalle righe degli studenti"""
     output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='openpyxl')
-    df.to_excel(writer, index=False, sheet_name='Programmazione')
+    writer = crea_excel_writer(output)
+    for canale, righe in righe_per_canale:
+        tabella_studenti(righe).to_excel(writer, index=False, sheet_name=f'Canale {canale}')
     writer.close()
     return output.getvalue()
 
+@st.fragment
+def pulsante_esportazione(etichetta, genera_dati, file_name, mime, chiave, etichetta_download="Download"):
+    """Pulsante che genera il file solo quando viene cliccato e ne offre poi il download.
+    È un frammento: il clic riesegue solo il pulsante e non l'intera pagina"""
+    if st.button(etichetta, key=f"esporta_{chiave}"):
+        try:
+            dati = genera_dati()
+        except Exception as e:
+            st.error(f"Errore nell'esportazione: {str(e)}")
+            return
+        st.download_button(
+            label=etichetta_download,
+            data=dati,
+            file_name=file_name,
+            mime=mime,
+            key=f"download_{chiave}"
+        )
+
 # Verifica se esistono le variabili di stato della sessione necessarie
 if 'sezione_corrente' not in st.session_state:
     st.session_state.sezione_corrente = 'Home'
@@ -283,11 +1021,13 @@ if 'anno_accademico' not in st.session_state:
 
 # Funzioni per cambiare sezione
 def vai_a_sezione(sezione):
+    # La sezione corrente non viene salvata su file: i dati sono già
+    # persistiti dalle operazioni che li modificano
     st.session_state.sezione_corrente = sezione
-    salva_dati_sessione()
 
 # Carica i dati salvati quando l'app viene avviata
 carica_dati_sessione()
+adotta_programmazione_globale()
 
 # Sidebar con informazioni sull'applicazione
 st.sidebar.title("SimPlanner")
@@ -297,6 +1037,13 @@ st.sidebar.markdown("### Autore:")
 st.sidebar.markdown("Dott. Riccardo Casciaro")
 st.sidebar.markdown("C.d.L. Infermieristica - Scuola di Medicina - Dipartimento di Scienze della Sanità Pubblica e Pediatriche - Università di Torino")
 st.sidebar.markdown("v1.0.0 - ©2025")
+st.sidebar.markdown("---")
+st.sidebar.checkbox("Mostra informazioni di debug della programmazione", key="debug_scheduler")
+
+# Le scritture del file di sessione avvengono in background: un errore viene segnalato qui
+errore_salvataggio = errore_salvataggio_sessione()
+if errore_salvataggio:
+    st.sidebar.error(f"Ultimo salvataggio dei dati non riuscito: {errore_salvataggio}")
 
 # Aggiungi documentazione alla sidebar
 add_manual_to_ui()
@@ -346,60 +1093,35 @@ if st.session_state.sezione_corrente == 'Home':
     Inizia selezionando una delle sezioni dalla barra di navigazione.
     """)
     
-    # Riepilogo
+    # Riepilogo: solo conteggi e date, le righe di testo vengono preparate una volta per combinazione di valori
+    num_canali = st.session_state.num_canali if hasattr(st.session_state, 'num_canali') else 1
+    conteggi_sessione = {
+        "studenti": len(st.session_state.studenti),
+        "studenti_per_canale": [(canale, len(studenti)) for canale, studenti in st.session_state.get("studenti_per_canale", {}).items()],
+        "laboratori": len(st.session_state.laboratori),
+        "aule": len(st.session_state.aule),
+        "num_canali": num_canali,
+        "data_inizio": st.session_state.data_inizio,
+        "data_fine": st.session_state.data_fine,
+        "gruppi_standard": len(st.session_state.gruppi_standard),
+        "gruppi_ridotti": len(st.session_state.gruppi_ridotti),
+        "gruppi_standard_per_canale": [(canale, len(gruppi)) for canale, gruppi in st.session_state.get("gruppi_standard_per_canale", {}).items()],
+        "gruppi_ridotti_per_canale": [(canale, len(gruppi)) for canale, gruppi in st.session_state.get("gruppi_ridotti_per_canale", {}).items()],
+        "programmazione": len(st.session_state.programmazione),
+        "programmazione_per_canale": [(canale, len(eventi)) for canale, eventi in st.session_state.get("programmazione_per_canale", {}).items()],
+    }
+    righe_dati, righe_statistiche = calcola_riepilogo_home(conteggi_sessione)
+    
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Riepilogo Dati")
-        
-        # Totale degli studenti (per retrocompatibilità)
-        st.write(f"Studenti totali: {len(st.session_state.studenti)}")
-        
-        # Studenti per canale
-        if 'studenti_per_canale' in st.session_state and st.session_state.studenti_per_canale:
-            for canale, studenti in st.session_state.studenti_per_canale.items():
-                st.write(f"Studenti Canale {canale}: {len(studenti)}")
-        
-        st.write(f"Laboratori: {len(st.session_state.laboratori)}")
-        st.write(f"Aule: {len(st.session_state.aule)}")
-        
-        # Canali configurati
-        num_canali = st.session_state.num_canali if hasattr(st.session_state, 'num_canali') else 1
-        st.write(f"Canali configurati: {num_canali}")
-        
-        if st.session_state.data_inizio and st.session_state.data_fine:
-            data_inizio = converti_data_italiana(st.session_state.data_inizio)
-            data_fine = converti_data_italiana(st.session_state.data_fine)
-            if data_inizio and data_fine:
-                giorni_lavorativi = crea_giorni_lavorativi(data_inizio, data_fine)
-                st.write(f"Periodo: dal {st.session_state.data_inizio} al {st.session_state.data_fine}")
-                st.write(f"Giorni lavorativi: {len(giorni_lavorativi)}")
+        for riga in righe_dati:
+            st.write(riga)
     
     with col2:
         st.subheader("Statistiche Gruppi e Programmazione")
-        
-        # Gruppi (per retrocompatibilità)
-        n_gruppi_standard = len(st.session_state.gruppi_standard.keys())
-        n_gruppi_ridotti = len(st.session_state.gruppi_ridotti.keys())
-        
-        # Gruppi per canale
-        if 'gruppi_standard_per_canale' in st.session_state and st.session_state.gruppi_standard_per_canale:
-            for canale, gruppi in st.session_state.gruppi_standard_per_canale.items():
-                st.write(f"Gruppi Standard Canale {canale}: {len(gruppi)}")
-        else:
-            st.write(f"Gruppi Standard totali: {n_gruppi_standard}")
-            
-        if 'gruppi_ridotti_per_canale' in st.session_state and st.session_state.gruppi_ridotti_per_canale:
-            for canale, gruppi in st.session_state.gruppi_ridotti_per_canale.items():
-                st.write(f"Gruppi Ridotti Canale {canale}: {len(gruppi)}")
-        else:
-            st.write(f"Gruppi a Capacità Ridotta totali: {n_gruppi_ridotti}")
-            
-        # Eventi programmati per canale
-        if 'programmazione_per_canale' in st.session_state and st.session_state.programmazione_per_canale:
-            for canale, eventi in st.session_state.programmazione_per_canale.items():
-                st.write(f"Eventi programmati Canale {canale}: {len(eventi)}")
-        else:
-            st.write(f"Eventi programmati totali: {len(st.session_state.programmazione)}")
+        for riga in righe_statistiche:
+            st.write(riga)
 
 elif st.session_state.sezione_corrente == 'Elenco Studenti':
     st.header("Gestione Elenco Studenti")
@@ -425,7 +1147,7 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
     # Selettore di canale se ci sono più canali
     canale_selezionato = 1
     if num_canali > 1:
-        opzioni_canale = {f"Canale {i}": i for i in range(1, num_canali + 1)}
+        opzioni_canale = opzioni_canali(num_canali)
         canale_txt = st.selectbox("Seleziona il canale", list(opzioni_canale.keys()))
         canale_selezionato = opzioni_canale[canale_txt]
     
@@ -447,32 +1169,30 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
                 col_nome = st.selectbox("Seleziona la colonna del Nome:", colonne)
                 
                 if st.button(f"Importa Studenti (Canale {canale_selezionato})"):
-                    studenti_importati = []
-                    for _, row in df_studenti.iterrows():
-                        try:
-                            cognome = str(row[col_cognome]).strip() if not pd.isna(row[col_cognome]) else ""
-                            nome = str(row[col_nome]).strip() if not pd.isna(row[col_nome]) else ""
-                            
-                            if cognome or nome:  # Almeno uno dei due deve essere presente
-                                studenti_importati.append({
-                                    "cognome": cognome,
-                                    "nome": nome,
-                                    "canale": canale_selezionato
-                                })
-                        except Exception as e:
-                            st.error(f"Errore nell'importazione: {str(e)}")
-                    
-                    # Aggiorna gli studenti del canale selezionato
-                    st.session_state.studenti_per_canale[canale_selezionato] = studenti_importati
-                    
-                    # Aggiorna anche la lista completa degli studenti per compatibilità
-                    tutti_studenti = []
-                    for c in st.session_state.studenti_per_canale:
-                        tutti_studenti.extend(st.session_state.studenti_per_canale[c])
-                    st.session_state.studenti = tutti_studenti
-                    
-                    st.success(f"Importati {len(studenti_importati)} studenti nel Canale {canale_selezionato} con successo!")
-                    salva_dati_sessione("importazione_studenti")
+                    try:
+                        # Normalizza le due colonne in blocco (celle vuote -> "", testo senza spazi)
+                        # e scorre direttamente gli array risultanti
+                        cognomi = df_studenti[col_cognome].astype("string").fillna("").str.strip().to_numpy()
+                        nomi = df_studenti[col_nome].astype("string").fillna("").str.strip().to_numpy()
+
+                        # Almeno uno dei due deve essere presente
+                        studenti_importati = [
+                            crea_studente(cognome, nome, canale_selezionato)
+                            for cognome, nome in zip(cognomi, nomi)
+                            if cognome or nome
+                        ]
+                    except Exception as e:
+                        # Importazione fallita: gli studenti già presenti nel canale restano invariati
+                        st.error(f"Errore nell'importazione: {str(e)}")
+                    else:
+                        # Aggiorna gli studenti del canale selezionato
+                        st.session_state.studenti_per_canale[canale_selezionato] = studenti_importati
+                        
+                        # Aggiorna anche la lista completa degli studenti per compatibilità
+                        st.session_state.studenti = appiattisci_studenti()
+                        
+                        st.success(f"Importati {len(studenti_importati)} studenti nel Canale {canale_selezionato} con successo!")
+                        salva_dati_sessione("importazione_studenti")
     
     else:  # Inserimento manuale
         st.subheader(f"Inserimento manuale studenti (Canale {canale_selezionato})")
@@ -490,11 +1210,7 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
                     nome = st.text_input(f"Nome studente {i+1}")
                 
                 if cognome or nome:  # Almeno uno dei due deve essere presente
-                    studenti_manuali.append({
-                        "cognome": cognome,
-                        "nome": nome,
-                        "canale": canale_selezionato
-                    })
+                    studenti_manuali.append(crea_studente(cognome, nome, canale_selezionato))
             
             if st.form_submit_button(f"Salva Studenti (Canale {canale_selezionato})"):
                 # Filtra gli studenti vuoti
@@ -504,10 +1220,7 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
                 st.session_state.studenti_per_canale[canale_selezionato] = studenti_manuali
                 
                 # Aggiorna anche la lista completa degli studenti per compatibilità
-                tutti_studenti = []
-                for c in st.session_state.studenti_per_canale:
-                    tutti_studenti.extend(st.session_state.studenti_per_canale[c])
-                st.session_state.studenti = tutti_studenti
+                st.session_state.studenti = appiattisci_studenti()
                 
                 st.success(f"Salvati {len(studenti_manuali)} studenti nel Canale {canale_selezionato} con successo!")
                 salva_dati_sessione("inserimento_manuale_studenti")
@@ -518,7 +1231,7 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
     # Se c'è un solo canale, visualizza direttamente
     if num_canali == 1:
         if st.session_state.studenti_per_canale[1]:
-            df_visualizza = pd.DataFrame(st.session_state.studenti_per_canale[1])
+            df_visualizza = tabella_studenti(righe_studenti(st.session_state.studenti_per_canale[1]))
             st.dataframe(df_visualizza, use_container_width=True)
             
             # Colonne per i pulsanti di esportazione ed eliminazione
@@ -526,14 +1239,14 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
             
             # Pulsante per esportare in Excel
             with col1:
-                if st.button("Esporta in Excel"):
-                    excel_data = converti_a_excel(df_visualizza)
-                    st.download_button(
-                        label="Download Excel",
-                        data=excel_data,
-                        file_name="elenco_studenti.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                pulsante_esportazione(
+                    "Esporta in Excel",
+                    lambda: converti_a_excel(df_visualizza),
+                    file_name="elenco_studenti.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    chiave="excel_studenti",
+                    etichetta_download="Download Excel"
+                )
             
             # Pulsante per eliminare l'elenco studenti
             with col2:
@@ -563,6 +1276,19 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
         for c in range(1, num_canali + 1):
             tabs.append(f"Canale {c}")
         
+        # Esportazione di tutti i canali in un unico file, un foglio per canale
+        pulsante_esportazione(
+            "Esporta tutti i canali in Excel",
+            lambda: converti_canali_a_excel(tuple(
+                (canale, righe_studenti(studenti))
+                for canale, studenti in st.session_state.studenti_per_canale.items()
+            )),
+            file_name="elenco_studenti_tutti_canali.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            chiave="excel_tutti_canali",
+            etichetta_download="Download Excel (tutti i canali)"
+        )
+        
         # Crea le tabs
         tabs_canali = st.tabs(tabs)
         
@@ -571,7 +1297,7 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
             canale = idx + 1
             with tab:
                 if st.session_state.studenti_per_canale[canale]:
-                    df_visualizza = pd.DataFrame(st.session_state.studenti_per_canale[canale])
+                    df_visualizza = tabella_studenti(righe_studenti(st.session_state.studenti_per_canale[canale]))
                     st.dataframe(df_visualizza, use_container_width=True)
                     
                     # Colonne per i pulsanti di esportazione ed eliminazione
@@ -579,15 +1305,14 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
                     
                     # Pulsante per esportare in Excel
                     with col1:
-                        if st.button(f"Esporta in Excel (Canale {canale})", key=f"export_excel_canale_{canale}"):
-                            excel_data = converti_a_excel(df_visualizza)
-                            st.download_button(
-                                label=f"Download Excel (Canale {canale})",
-                                data=excel_data,
-                                file_name=f"elenco_studenti_canale_{canale}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                key=f"download_excel_canale_{canale}"
-                            )
+                        pulsante_esportazione(
+                            f"Esporta in Excel (Canale {canale})",
+                            lambda df=df_visualizza: converti_a_excel(df),
+                            file_name=f"elenco_studenti_canale_{canale}.xlsx",
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            chiave=f"excel_canale_{canale}",
+                            etichetta_download=f"Download Excel (Canale {canale})"
+                        )
                     
                     # Pulsante per eliminare l'elenco studenti del canale
                     with col2:
@@ -600,10 +1325,7 @@ elif st.session_state.sezione_corrente == 'Elenco Studenti':
                                 st.session_state.studenti_per_canale[canale] = []
                                 
                                 # Aggiorna anche la lista completa degli studenti per compatibilità
-                                tutti_studenti = []
-                                for c in st.session_state.studenti_per_canale:
-                                    tutti_studenti.extend(st.session_state.studenti_per_canale[c])
-                                st.session_state.studenti = tutti_studenti
+                                st.session_state.studenti = appiattisci_studenti()
                                 
                                 # Aggiorna i gruppi (questo sarà implementato in seguito)
                                 # TO DO: Aggiornare i gruppi quando verrà implementata la gestione multi-canale
@@ -628,15 +1350,6 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
     # Gestione laboratori
     st.subheader("Gestione Laboratori")
     
-    # Selezione delle fasce orarie in cui il laboratorio può essere programmato
-    fasce_orarie_disponibili = [
-        "8:30-11:00",
-        "11:10-13:30",
-        "14:30-17:00",
-        "8:30-13:30",
-        "8:30-17:00"
-    ]
-    
     # Crei un container per il form e gli input fuori dal form
     form_container = st.container()
     
@@ -664,7 +1377,7 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
         # Selezione delle fasce orarie all'interno del form
         fasce_orarie_selezionate = st.multiselect(
             "Fasce orarie disponibili", 
-            fasce_orarie_disponibili,
+            FASCE_ORARIE_DISPONIBILI,
             default=["8:30-11:00", "11:10-13:30", "14:30-17:00"]  # Default: le fasce brevi
         )
         
@@ -672,10 +1385,7 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
         date_disponibili = []
         if st.session_state.data_inizio and st.session_state.data_fine:
             try:
-                inizio = converti_data_italiana(st.session_state.data_inizio)
-                fine = converti_data_italiana(st.session_state.data_fine)
-                giorni_lavorativi = crea_giorni_lavorativi(inizio, fine)
-                date_disponibili = [d.strftime("%d/%m/%Y") for d in giorni_lavorativi]
+                date_disponibili = date_lavorative_disponibili(st.session_state.data_inizio, st.session_state.data_fine)
             except Exception as e:
                 st.warning(f"Impossibile caricare le date: {str(e)}")
         
@@ -691,9 +1401,7 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
     # Gestione del submit fuori dal form
     if form_submit:
         # Verifica se il laboratorio esiste già
-        nomi_lab_esistenti = [lab["nome"] for lab in st.session_state.laboratori]
-        
-        if nome_lab in nomi_lab_esistenti:
+        if nome_lab in laboratori_per_nome():
             st.error(f"Il laboratorio '{nome_lab}' esiste già!")
         elif not nome_lab:
             st.error("Il nome del laboratorio non può essere vuoto!")
@@ -710,6 +1418,8 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
             }
             
             st.session_state.laboratori.append(nuovo_lab)
+            invalida_indice_laboratori()
+            invalida_laboratori_classificati()
             st.success(f"Laboratorio '{nome_lab}' aggiunto con successo!")
             salva_dati_sessione()
     
@@ -717,81 +1427,80 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
     if st.session_state.laboratori:
         st.subheader("Laboratori configurati")
         
-        df_laboratori = pd.DataFrame(st.session_state.laboratori)
-        df_laboratori.index = df_laboratori.index + 1  # Inizia da 1 invece che da 0
-        st.dataframe(df_laboratori, use_container_width=True)
-        
-        # Modifica delle fasce orarie e date disponibili per un laboratorio esistente
-        st.subheader("Modifica fasce orarie e date disponibili per laboratorio")
-        lab_da_modificare = st.selectbox("Seleziona laboratorio da modificare:", 
-                                        [lab["nome"] for lab in st.session_state.laboratori],
-                                        key="modifica_lab_fasce")
-        
-        # Trova il laboratorio selezionato
-        lab_selezionato = next((lab for lab in st.session_state.laboratori if lab["nome"] == lab_da_modificare), None)
-        
-        if lab_selezionato:
-            # Definisci le fasce orarie disponibili
-            fasce_orarie_disponibili = [
-                "8:30-11:00",
-                "11:10-13:30",
-                "14:30-17:00",
-                "8:30-13:30",
-                "8:30-17:00"
-            ]
-            
-            # Ottieni l'elenco delle fasce orarie attualmente selezionate per questo laboratorio
-            fasce_attuali = lab_selezionato.get("fasce_orarie_disponibili", ["8:30-11:00", "11:10-13:30", "14:30-17:00"])
-            
-            # Mostra un multi-select con tutte le fasce orarie, selezionando quelle attualmente configurate
-            nuove_fasce = st.multiselect(
-                f"Fasce orarie disponibili per '{lab_da_modificare}':", 
-                fasce_orarie_disponibili,
-                default=fasce_attuali
-            )
+        df_laboratori = tabella_laboratori(st.session_state.laboratori)
+        # Tabella in sola lettura con chiave fissa: il componente resta lo stesso tra un rerun e l'altro
+        st.data_editor(df_laboratori, key="tabella_laboratori", use_container_width=True, disabled=True)
+        
+        # Modifica delle fasce orarie e date disponibili per un laboratorio esistente.
+        # È un frammento: interagire con i suoi widget riesegue solo questo blocco e non l'intera pagina
+        @st.fragment
+        def modifica_laboratorio():
+            st.subheader("Modifica fasce orarie e date disponibili per laboratorio")
+            lab_da_modificare = st.selectbox("Seleziona laboratorio da modificare:", 
+                                            nomi_laboratori(),
+                                            key="modifica_lab_fasce")
+        
+            # Trova il laboratorio selezionato
+            lab_selezionato = laboratori_per_nome().get(lab_da_modificare)
+        
+            if lab_selezionato:
+                # Ottieni l'elenco delle fasce orarie attualmente selezionate per questo laboratorio
+                fasce_attuali = lab_selezionato.get("fasce_orarie_disponibili", ["8:30-11:00", "11:10-13:30", "14:30-17:00"])
+            
+                # Mostra un multi-select con tutte le fasce orarie, selezionando quelle attualmente configurate
+                nuove_fasce = st.multiselect(
+                    f"Fasce orarie disponibili per '{lab_da_modificare}':", 
+                    FASCE_ORARIE_DISPONIBILI,
+                    default=fasce_attuali
+                )
             
-            # Ottieni i giorni lavorativi dalle date definite (se esistono)
-            date_disponibili = []
-            if st.session_state.data_inizio and st.session_state.data_fine:
-                try:
-                    inizio = converti_data_italiana(st.session_state.data_inizio)
-                    fine = converti_data_italiana(st.session_state.data_fine)
-                    giorni_lavorativi = crea_giorni_lavorativi(inizio, fine)
-                    date_disponibili = [d.strftime("%d/%m/%Y") for d in giorni_lavorativi]
-                except Exception as e:
-                    st.warning(f"Impossibile caricare le date: {str(e)}")
+                # Ottieni i giorni lavorativi dalle date definite (se esistono)
+                date_disponibili = []
+                if st.session_state.data_inizio and st.session_state.data_fine:
+                    try:
+                        date_disponibili = date_lavorative_disponibili(st.session_state.data_inizio, st.session_state.data_fine)
+                    except Exception as e:
+                        st.warning(f"Impossibile caricare le date: {str(e)}")
             
-            # Ottieni le date attualmente selezionate per questo laboratorio
-            date_attuali = lab_selezionato.get("date_disponibili", [])
+                # Ottieni le date attualmente selezionate per questo laboratorio
+                date_attuali = lab_selezionato.get("date_disponibili", [])
             
-            # Selezione delle date disponibili per il laboratorio
-            st.write(f"Seleziona le date in cui è possibile effettuare il laboratorio '{lab_da_modificare}':")
-            nuove_date = st.multiselect(
-                "Date disponibili (se nessuna è selezionata, tutte le date sono disponibili)", 
-                date_disponibili if date_disponibili else [],
-                default=date_attuali
-            )
+                # Selezione delle date disponibili per il laboratorio
+                st.write(f"Seleziona le date in cui è possibile effettuare il laboratorio '{lab_da_modificare}':")
+                nuove_date = st.multiselect(
+                    "Date disponibili (se nessuna è selezionata, tutte le date sono disponibili)", 
+                    date_disponibili if date_disponibili else [],
+                    default=date_attuali
+                )
             
-            if st.button("Aggiorna impostazioni laboratorio"):
-                # Aggiorna il laboratorio con le nuove fasce orarie e date
-                for i, lab in enumerate(st.session_state.laboratori):
-                    if lab["nome"] == lab_da_modificare:
-                        st.session_state.laboratori[i]["fasce_orarie_disponibili"] = nuove_fasce
-                        st.session_state.laboratori[i]["date_disponibili"] = nuove_date
-                        break
+                if st.button("Aggiorna impostazioni laboratorio"):
+                    # Aggiorna il laboratorio con le nuove fasce orarie e date
+                    # Il dizionario dell'indice è lo stesso oggetto contenuto nell'elenco dei laboratori
+                    lab_selezionato.update({
+                        "fasce_orarie_disponibili": nuove_fasce,
+                        "date_disponibili": nuove_date
+                    })
+                    invalida_laboratori_classificati()
                 
-                st.success(f"Impostazioni per '{lab_da_modificare}' aggiornate!")
-                salva_dati_sessione()
-                st.rerun()
+                    st.success(f"Impostazioni per '{lab_da_modificare}' aggiornate!")
+                    salva_dati_sessione()
+                    st.rerun()
+
+        modifica_laboratorio()
         
         # Pulsante per eliminare laboratori
         st.subheader("Elimina laboratorio")
         lab_da_eliminare = st.selectbox("Seleziona laboratorio da eliminare:", 
-                                      [lab["nome"] for lab in st.session_state.laboratori])
+                                      nomi_laboratori())
         
         if st.button("Elimina Laboratorio"):
-            st.session_state.laboratori = [lab for lab in st.session_state.laboratori 
-                                          if lab["nome"] != lab_da_eliminare]
+            # Rimozione in place per posizione (senza cercare il laboratorio nell'elenco):
+            # l'elenco non viene ricostruito, l'indice per nome va scartato
+            posizione = posizione_laboratorio(lab_da_eliminare)
+            if posizione is not None:
+                del st.session_state.laboratori[posizione]
+                invalida_indice_laboratori()
+                invalida_laboratori_classificati()
             st.success(f"Laboratorio '{lab_da_eliminare}' eliminato!")
             salva_dati_sessione()
             st.rerun()
@@ -808,7 +1517,7 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
         # Se è configurato più di un canale, offrire la possibilità di selezionare quale canale gestire
         canale_selezionato = 1
         if num_canali > 1:
-            opzioni_canale = {f"Canale {i}": i for i in range(1, num_canali + 1)}
+            opzioni_canale = opzioni_canali(num_canali)
             canale_txt = st.selectbox("Seleziona il canale per la generazione dei gruppi", list(opzioni_canale.keys()))
             canale_selezionato = opzioni_canale[canale_txt]
             st.info(f"Stai generando i gruppi per il Canale {canale_selezionato}")
@@ -816,137 +1525,66 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
         col1, col2 = st.columns(2)
         
         # Determina il prefisso per la lettera del canale
-        prefisso_lettera = chr(64 + canale_selezionato)  # A=1, B=2, C=3, ...
+        prefisso_lettera = LETTERE_CANALI[canale_selezionato - 1]  # A=1, B=2, C=3, ...
         
-        # Gruppi standard
-        with col1:
-            st.write(f"Configurazione Gruppi Standard (Canale {canale_selezionato})")
+        def configura_gruppi(tipo_gruppo, chiave_gruppi, titolo, nome_breve, descrizione, intervallo_nomi, valore_predefinito, nome_gruppo):
+            """Mostra la configurazione e il pulsante di generazione dei gruppi di un tipo per il canale selezionato"""
+            st.write(f"Configurazione Gruppi {titolo} (Canale {canale_selezionato})")
             
-            n_gruppi_standard = st.number_input(f"Numero Gruppi Standard per Canale {canale_selezionato} ({prefisso_lettera}A-{prefisso_lettera}E):", 
-                                              min_value=1, max_value=10, value=5)
+            n_gruppi = st.number_input(f"Numero Gruppi {nome_breve} per Canale {canale_selezionato} ({intervallo_nomi}):", 
+                                       min_value=1, max_value=10, value=valore_predefinito)
             
-            # Genera nomi dei gruppi con prefisso appropriato del canale
-            nomi_gruppi = [f"{prefisso_lettera}{chr(65+i)}" for i in range(int(n_gruppi_standard))]
-            gruppi_standard = {nome: [] for nome in nomi_gruppi}
-            
-            if st.button(f"Genera Gruppi Standard (Canale {canale_selezionato})"):
-                # Ottieni solo gli studenti per laboratori standard di questo canale
-                labs_standard = [lab for lab in st.session_state.laboratori 
-                                if lab["tipo_gruppo"] == "standard"]
+            if st.button(f"Genera Gruppi {nome_breve} (Canale {canale_selezionato})"):
+                # Limiti di studenti dei soli laboratori di questo tipo
+                limiti = limiti_studenti_per_tipo(chiave_laboratori()).get(tipo_gruppo)
                 
-                if not labs_standard:
-                    st.error("Non ci sono laboratori configurati per gruppi standard!")
-                else:
-                    # Calcola numero medio di studenti per gruppo
-                    min_studenti = min([lab["min_studenti"] for lab in labs_standard])
-                    max_studenti = max([lab["max_studenti"] for lab in labs_standard])
-                    
-                    # Ottieni studenti di questo canale
-                    studenti_canale = st.session_state.studenti_per_canale.get(canale_selezionato, [])
-                    
-                    if not studenti_canale:
-                        st.error(f"Non ci sono studenti nel Canale {canale_selezionato}. Vai prima alla sezione 'Elenco Studenti' per inserirli.")
-                    else:
-                        # Distribuisci equamente gli studenti nei gruppi
-                        studenti_per_gruppo = len(studenti_canale) // n_gruppi_standard
-                        resto = len(studenti_canale) % n_gruppi_standard
-                        
-                        # Verifica limiti
-                        if studenti_per_gruppo < min_studenti:
-                            st.warning(f"Con {n_gruppi_standard} gruppi, ci sarebbero meno di {min_studenti} studenti per gruppo!")
-                        elif studenti_per_gruppo > max_studenti:
-                            st.warning(f"Con {n_gruppi_standard} gruppi, ci sarebbero più di {max_studenti} studenti per gruppo!")
-                        
-                        # Assegna studenti ai gruppi
-                        indice_studente = 0
-                        for nome_gruppo in gruppi_standard.keys():
-                            studenti_questo_gruppo = studenti_per_gruppo
-                            if resto > 0:
-                                studenti_questo_gruppo += 1
-                                resto -= 1
-                                
-                            gruppi_standard[nome_gruppo] = studenti_canale[indice_studente:indice_studente+studenti_questo_gruppo]
-                            indice_studente += studenti_questo_gruppo
-                        
-                        # Aggiorna i gruppi standard nella session state
-                        if 'gruppi_standard_per_canale' not in st.session_state:
-                            st.session_state.gruppi_standard_per_canale = {}
-                        
-                        st.session_state.gruppi_standard_per_canale[canale_selezionato] = gruppi_standard
-                        
-                        # Manteniamo anche la struttura originale per compatibilità
-                        st.session_state.gruppi_standard = {}
-                        for canale in st.session_state.gruppi_standard_per_canale:
-                            for gruppo, studenti in st.session_state.gruppi_standard_per_canale[canale].items():
-                                st.session_state.gruppi_standard[gruppo] = studenti
-                        
-                        st.success(f"Gruppi standard per Canale {canale_selezionato} generati con successo!")
-                        salva_dati_sessione("generazione_gruppi_standard")
+                if not limiti:
+                    st.error(f"Non ci sono laboratori configurati per gruppi {descrizione}!")
+                    return
+                
+                # Calcola numero medio di studenti per gruppo
+                min_studenti, max_studenti = limiti
+                
+                # Ottieni studenti di questo canale
+                studenti_canale = st.session_state.studenti_per_canale.get(canale_selezionato, [])
+                
+                if not studenti_canale:
+                    st.error(f"Non ci sono studenti nel Canale {canale_selezionato}. Vai prima alla sezione 'Elenco Studenti' per inserirli.")
+                    return
+                
+                # Distribuisci equamente gli studenti nei gruppi
+                studenti_per_gruppo = len(studenti_canale) // n_gruppi
+                
+                # Verifica limiti
+                if studenti_per_gruppo < min_studenti:
+                    st.warning(f"Con {n_gruppi} gruppi, ci sarebbero meno di {min_studenti} studenti per gruppo!")
+                elif studenti_per_gruppo > max_studenti:
+                    st.warning(f"Con {n_gruppi} gruppi, ci sarebbero più di {max_studenti} studenti per gruppo!")
+                
+                # Genera nomi dei gruppi con prefisso appropriato del canale
+                nomi_gruppi = [nome_gruppo(i) for i in range(int(n_gruppi))]
+                
+                # Assegna studenti ai gruppi e aggiorna la session state
+                gruppi_per_canale = st.session_state.setdefault(f"{chiave_gruppi}_per_canale", {})
+                gruppi_per_canale[canale_selezionato] = dividi_in_gruppi(studenti_canale, nomi_gruppi)
+                
+                # Manteniamo anche la struttura originale per compatibilità
+                st.session_state[chiave_gruppi] = appiattisci_gruppi(gruppi_per_canale)
+                
+                st.success(f"Gruppi {descrizione} per Canale {canale_selezionato} generati con successo!")
+                salva_dati_sessione(f"generazione_{chiave_gruppi}")
+        
+        # Gruppi standard
+        with col1:
+            configura_gruppi("standard", "gruppi_standard", "Standard", "Standard", "standard",
+                             f"{prefisso_lettera}A-{prefisso_lettera}E", 5,
+                             lambda i: f"{prefisso_lettera}{chr(65+i)}")
         
         # Gruppi a capacità ridotta
         with col2:
-            st.write(f"Configurazione Gruppi a Capacità Ridotta (Canale {canale_selezionato})")
-            
-            n_gruppi_ridotti = st.number_input(f"Numero Gruppi Ridotti per Canale {canale_selezionato} ({prefisso_lettera}1-{prefisso_lettera}8):", 
-                                             min_value=1, max_value=10, value=8)
-            
-            # Genera nomi dei gruppi con prefisso appropriato del canale
-            nomi_gruppi = [f"{prefisso_lettera}{i+1}" for i in range(int(n_gruppi_ridotti))]
-            gruppi_ridotti = {nome: [] for nome in nomi_gruppi}
-            
-            if st.button(f"Genera Gruppi Ridotti (Canale {canale_selezionato})"):
-                # Ottieni solo gli studenti per laboratori a capacità ridotta
-                labs_ridotti = [lab for lab in st.session_state.laboratori 
-                               if lab["tipo_gruppo"] == "ridotto"]
-                
-                if not labs_ridotti:
-                    st.error("Non ci sono laboratori configurati per gruppi a capacità ridotta!")
-                else:
-                    # Calcola numero medio di studenti per gruppo
-                    min_studenti = min([lab["min_studenti"] for lab in labs_ridotti])
-                    max_studenti = max([lab["max_studenti"] for lab in labs_ridotti])
-                    
-                    # Ottieni studenti di questo canale
-                    studenti_canale = st.session_state.studenti_per_canale.get(canale_selezionato, [])
-                    
-                    if not studenti_canale:
-                        st.error(f"Non ci sono studenti nel Canale {canale_selezionato}. Vai prima alla sezione 'Elenco Studenti' per inserirli.")
-                    else:
-                        # Distribuisci equamente gli studenti nei gruppi
-                        studenti_per_gruppo = len(studenti_canale) // n_gruppi_ridotti
-                        resto = len(studenti_canale) % n_gruppi_ridotti
-                        
-                        # Verifica limiti
-                        if studenti_per_gruppo < min_studenti:
-                            st.warning(f"Con {n_gruppi_ridotti} gruppi, ci sarebbero meno di {min_studenti} studenti per gruppo!")
-                        elif studenti_per_gruppo > max_studenti:
-                            st.warning(f"Con {n_gruppi_ridotti} gruppi, ci sarebbero più di {max_studenti} studenti per gruppo!")
-                        
-                        # Assegna studenti ai gruppi
-                        indice_studente = 0
-                        for nome_gruppo in gruppi_ridotti.keys():
-                            studenti_questo_gruppo = studenti_per_gruppo
-                            if resto > 0:
-                                studenti_questo_gruppo += 1
-                                resto -= 1
-                                
-                            gruppi_ridotti[nome_gruppo] = studenti_canale[indice_studente:indice_studente+studenti_questo_gruppo]
-                            indice_studente += studenti_questo_gruppo
-                        
-                        # Aggiorna i gruppi ridotti nella session state
-                        if 'gruppi_ridotti_per_canale' not in st.session_state:
-                            st.session_state.gruppi_ridotti_per_canale = {}
-                        
-                        st.session_state.gruppi_ridotti_per_canale[canale_selezionato] = gruppi_ridotti
-                        
-                        # Manteniamo anche la struttura originale per compatibilità
-                        st.session_state.gruppi_ridotti = {}
-                        for canale in st.session_state.gruppi_ridotti_per_canale:
-                            for gruppo, studenti in st.session_state.gruppi_ridotti_per_canale[canale].items():
-                                st.session_state.gruppi_ridotti[gruppo] = studenti
-                        
-                        st.success(f"Gruppi a capacità ridotta per Canale {canale_selezionato} generati con successo!")
-                        salva_dati_sessione("generazione_gruppi_ridotti")
+            configura_gruppi("ridotto", "gruppi_ridotti", "a Capacità Ridotta", "Ridotti", "a capacità ridotta",
+                             f"{prefisso_lettera}1-{prefisso_lettera}8", 8,
+                             lambda i: f"{prefisso_lettera}{i+1}")
         
         # Visualizza gruppi generati
         st.subheader("Visualizzazione Gruppi")
@@ -958,28 +1596,14 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
                 if st.button("📄 Esporta Gruppi in PDF", type="primary", use_container_width=True, 
                           help="Esporta l'elenco completo dei gruppi e degli studenti in formato PDF"):
                     # Prepara i dati per l'esportazione
-                    sede_cdl = st.session_state.sede_selezionata if hasattr(st.session_state, 'sede_selezionata') else None
-                    anno_corso = st.session_state.anno_corso if hasattr(st.session_state, 'anno_corso') else None
-                    anno_accademico = st.session_state.anno_accademico if hasattr(st.session_state, 'anno_accademico') else None
+                    sede_cdl, anno_corso, anno_accademico = dati_intestazione_pdf()
                     
                     # Estrai laboratori per gruppo dalla programmazione se disponibile
-                    laboratori_per_gruppo = {}
-                    if st.session_state.programmazione:
-                        for evento in st.session_state.programmazione:
-                            gruppo = evento.get('gruppo', '')
-                            if gruppo not in laboratori_per_gruppo:
-                                laboratori_per_gruppo[gruppo] = []
-                            
-                            laboratori_per_gruppo[gruppo].append({
-                                'data': evento.get('data', ''),
-                                'orario': f"{evento.get('ora_inizio', '')}-{evento.get('ora_fine', '')}",
-                                'nome': evento.get('laboratorio', ''),
-                                'aula': evento.get('aula', '')
-                            })
+                    laboratori_per_gruppo = raggruppa_laboratori_per_gruppo(st.session_state.programmazione)
                     
                     # Genera il PDF
                     try:
-                        pdf_data = export_student_groups_pdf(
+                        pdf_data = genera_pdf_gruppi(
                             st.session_state.gruppi_standard,
                             laboratori_per_gruppo,
                             sede_cdl=sede_cdl,
@@ -1004,65 +1628,34 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
         
         # Se c'è un solo canale, visualizza i gruppi normalmente
         if num_canali == 1:
+            # Dati comuni ai PDF dei singoli gruppi
+            intestazione_pdf = dati_intestazione_pdf()
+            laboratori_tutti_gruppi = raggruppa_laboratori_per_gruppo(st.session_state.programmazione)
+            
             # Visualizza gruppi standard
             if st.session_state.gruppi_standard:
                 st.write("Gruppi Standard:")
                 
+                # Un expander per gruppo, per tenere compatta la pagina (il contenuto viene comunque calcolato a ogni rerun)
                 for nome_gruppo, studenti in st.session_state.gruppi_standard.items():
-                    st.write(f"**{nome_gruppo}**: {len(studenti)} studenti")
-                    
-                    # Pulsante per esportare solo questo gruppo in PDF
-                    if st.button(f"📄 Esporta Gruppo {nome_gruppo} in PDF", key=f"export_pdf_{nome_gruppo}"):
-                        # Prepara i dati per l'esportazione
-                        sede_cdl = st.session_state.sede_selezionata if hasattr(st.session_state, 'sede_selezionata') else None
-                        anno_corso = st.session_state.anno_corso if hasattr(st.session_state, 'anno_corso') else None
-                        anno_accademico = st.session_state.anno_accademico if hasattr(st.session_state, 'anno_accademico') else None
-                        
-                        # Estrai laboratori per questo gruppo
-                        laboratori_per_gruppo = {}
-                        if st.session_state.programmazione:
-                            for evento in st.session_state.programmazione:
-                                if evento.get('gruppo', '') == nome_gruppo:
-                                    if nome_gruppo not in laboratori_per_gruppo:
-                                        laboratori_per_gruppo[nome_gruppo] = []
-                                    
-                                    laboratori_per_gruppo[nome_gruppo].append({
-                                        'data': evento.get('data', ''),
-                                        'orario': f"{evento.get('ora_inizio', '')}-{evento.get('ora_fine', '')}",
-                                        'nome': evento.get('laboratorio', ''),
-                                        'aula': evento.get('aula', '')
-                                    })
-                        
-                        # Genera il PDF solo per questo gruppo
-                        try:
-                            gruppo_singolo = {nome_gruppo: studenti}
-                            pdf_data = export_student_groups_pdf(
-                                gruppo_singolo,
-                                laboratori_per_gruppo,
-                                sede_cdl=sede_cdl,
-                                anno_corso=anno_corso,
-                                anno_accademico=anno_accademico
-                            )
-                            
-                            # Fornisci il PDF per il download
-                            st.download_button(
-                                label=f"Download PDF Gruppo {nome_gruppo}",
-                                data=pdf_data,
-                                file_name=f"gruppo_{nome_gruppo}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                                mime="application/pdf",
-                                key=f"download_pdf_{nome_gruppo}"
-                            )
-                            
-                            st.success(f"PDF del gruppo {nome_gruppo} generato con successo!")
-                        except Exception as e:
-                            st.error(f"Errore nella generazione del PDF: {str(e)}")
+                    with st.expander(f"{nome_gruppo} — {len(studenti)} studenti"):
+                        # Pulsante per esportare solo questo gruppo in PDF: il file viene generato solo al clic
+                        # (e poi riletto dalla cache finché gruppo e programmazione non cambiano)
+                        pulsante_esportazione(
+                            f"📄 Esporta Gruppo {nome_gruppo} in PDF",
+                            functools.partial(pdf_singolo_gruppo, nome_gruppo, studenti, laboratori_tutti_gruppi, intestazione_pdf),
+                            file_name=f"gruppo_{nome_gruppo}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                            mime="application/pdf",
+                            chiave=f"pdf_{nome_gruppo}",
+                            etichetta_download=f"Download PDF Gruppo {nome_gruppo}"
+                        )
                     
-                    # Crea DataFrame per questo gruppo
-                    if studenti:
-                        df_gruppo = pd.DataFrame(studenti)
-                        st.dataframe(df_gruppo, use_container_width=True)
-                    else:
-                        st.info(f"Nessuno studente assegnato al {nome_gruppo}")
+                        # Crea DataFrame per questo gruppo
+                        if studenti:
+                            df_gruppo = pd.DataFrame(studenti_a_colonne(studenti), copy=False)
+                            st.dataframe(df_gruppo, use_container_width=True)
+                        else:
+                            st.info(f"Nessuno studente assegnato al {nome_gruppo}")
             else:
                 st.info("Nessun gruppo standard generato")
             
@@ -1070,66 +1663,33 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
             if st.session_state.gruppi_ridotti:
                 st.write("Gruppi a Capacità Ridotta:")
                 
+                # Un expander per gruppo, per tenere compatta la pagina (il contenuto viene comunque calcolato a ogni rerun)
                 for nome_gruppo, studenti in st.session_state.gruppi_ridotti.items():
-                    st.write(f"**{nome_gruppo}**: {len(studenti)} studenti")
-                    
-                    # Pulsante per esportare solo questo gruppo in PDF
-                    if st.button(f"📄 Esporta Gruppo {nome_gruppo} in PDF", key=f"export_pdf_ridotto_{nome_gruppo}"):
-                        # Prepara i dati per l'esportazione
-                        sede_cdl = st.session_state.sede_selezionata if hasattr(st.session_state, 'sede_selezionata') else None
-                        anno_corso = st.session_state.anno_corso if hasattr(st.session_state, 'anno_corso') else None
-                        anno_accademico = st.session_state.anno_accademico if hasattr(st.session_state, 'anno_accademico') else None
-                        
-                        # Estrai laboratori per questo gruppo
-                        laboratori_per_gruppo = {}
-                        if st.session_state.programmazione:
-                            for evento in st.session_state.programmazione:
-                                if evento.get('gruppo', '') == nome_gruppo:
-                                    if nome_gruppo not in laboratori_per_gruppo:
-                                        laboratori_per_gruppo[nome_gruppo] = []
-                                    
-                                    laboratori_per_gruppo[nome_gruppo].append({
-                                        'data': evento.get('data', ''),
-                                        'orario': f"{evento.get('ora_inizio', '')}-{evento.get('ora_fine', '')}",
-                                        'nome': evento.get('laboratorio', ''),
-                                        'aula': evento.get('aula', '')
-                                    })
-                        
-                        # Genera il PDF solo per questo gruppo
-                        try:
-                            gruppo_singolo = {nome_gruppo: studenti}
-                            pdf_data = export_student_groups_pdf(
-                                gruppo_singolo,
-                                laboratori_per_gruppo,
-                                sede_cdl=sede_cdl,
-                                anno_corso=anno_corso,
-                                anno_accademico=anno_accademico
-                            )
-                            
-                            # Fornisci il PDF per il download
-                            st.download_button(
-                                label=f"Download PDF Gruppo {nome_gruppo}",
-                                data=pdf_data,
-                                file_name=f"gruppo_{nome_gruppo}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                                mime="application/pdf",
-                                key=f"download_pdf_ridotto_{nome_gruppo}"
-                            )
-                            
-                            st.success(f"PDF del gruppo {nome_gruppo} generato con successo!")
-                        except Exception as e:
-                            st.error(f"Errore nella generazione del PDF: {str(e)}")
+                    with st.expander(f"{nome_gruppo} — {len(studenti)} studenti"):
+                        # Pulsante per esportare solo questo gruppo in PDF: il file viene generato solo al clic
+                        # (e poi riletto dalla cache finché gruppo e programmazione non cambiano)
+                        pulsante_esportazione(
+                            f"📄 Esporta Gruppo {nome_gruppo} in PDF",
+                            functools.partial(pdf_singolo_gruppo, nome_gruppo, studenti, laboratori_tutti_gruppi, intestazione_pdf),
+                            file_name=f"gruppo_{nome_gruppo}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                            mime="application/pdf",
+                            chiave=f"pdf_ridotto_{nome_gruppo}",
+                            etichetta_download=f"Download PDF Gruppo {nome_gruppo}"
+                        )
                     
-                    # Crea DataFrame per questo gruppo
-                    if studenti:
-                        df_gruppo = pd.DataFrame(studenti)
-                        st.dataframe(df_gruppo, use_container_width=True)
-                    else:
-                        st.info(f"Nessuno studente assegnato al {nome_gruppo}")
+                        # Crea DataFrame per questo gruppo
+                        if studenti:
+                            df_gruppo = pd.DataFrame(studenti_a_colonne(studenti), copy=False)
+                            st.dataframe(df_gruppo, use_container_width=True)
+                        else:
+                            st.info(f"Nessuno studente assegnato al {nome_gruppo}")
             else:
                 st.info("Nessun gruppo a capacità ridotta generato")
                 
         else:
             # Per più canali, usa tabs per mostrare i gruppi di ciascun canale
+            # (gli eventi di tutti i canali vengono raggruppati una sola volta per l'esportazione PDF)
+            laboratori_per_canale = raggruppa_laboratori_per_canale(st.session_state.get('programmazione_per_canale', {}))
             tab_titles = [f"Canale {i}" for i in range(1, num_canali + 1)]
             tabs = st.tabs(tab_titles)
             
@@ -1147,28 +1707,14 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
                         # Pulsante per esportare tutti i gruppi di questo canale in PDF
                         if st.button(f"📄 Esporta Tutti i Gruppi Canale {canale} in PDF", key=f"export_all_pdf_canale_{canale}"):
                             # Prepara i dati per l'esportazione
-                            sede_cdl = st.session_state.sede_selezionata if hasattr(st.session_state, 'sede_selezionata') else None
-                            anno_corso = st.session_state.anno_corso if hasattr(st.session_state, 'anno_corso') else None
-                            anno_accademico = st.session_state.anno_accademico if hasattr(st.session_state, 'anno_accademico') else None
+                            sede_cdl, anno_corso, anno_accademico = dati_intestazione_pdf()
                             
                             # Estrai eventi programmati per questo canale
-                            laboratori_per_gruppo = {}
-                            if 'programmazione_per_canale' in st.session_state and canale in st.session_state.programmazione_per_canale:
-                                for evento in st.session_state.programmazione_per_canale[canale]:
-                                    gruppo = evento.get('gruppo', '')
-                                    if gruppo not in laboratori_per_gruppo:
-                                        laboratori_per_gruppo[gruppo] = []
-                                    
-                                    laboratori_per_gruppo[gruppo].append({
-                                        'data': evento.get('data', ''),
-                                        'orario': f"{evento.get('ora_inizio', '')}-{evento.get('ora_fine', '')}",
-                                        'nome': evento.get('laboratorio', ''),
-                                        'aula': evento.get('aula', '')
-                                    })
+                            laboratori_per_gruppo = laboratori_per_canale.get(canale, {})
                             
                             # Genera il PDF per tutti i gruppi di questo canale
                             try:
-                                pdf_data = export_student_groups_pdf(
+                                pdf_data = genera_pdf_gruppi(
                                     gruppi_standard_canale,
                                     laboratori_per_gruppo,
                                     sede_cdl=sede_cdl,
@@ -1189,16 +1735,13 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
                             except Exception as e:
                                 st.error(f"Errore nella generazione del PDF: {str(e)}")
                         
-                        # Visualizza ciascun gruppo di questo canale
-                        for nome_gruppo, studenti in gruppi_standard_canale.items():
-                            st.write(f"**{nome_gruppo}**: {len(studenti)} studenti")
-                            
-                            # Crea DataFrame per questo gruppo
-                            if studenti:
-                                df_gruppo = pd.DataFrame(studenti)
-                                st.dataframe(df_gruppo, use_container_width=True)
-                            else:
-                                st.info(f"Nessuno studente assegnato al {nome_gruppo}")
+                        # Numero di studenti per gruppo e un'unica tabella con tutti i gruppi del canale
+                        st.write(" · ".join(f"**{nome_gruppo}**: {len(studenti)} studenti" for nome_gruppo, studenti in gruppi_standard_canale.items()))
+                        gruppi_vuoti = [nome_gruppo for nome_gruppo, studenti in gruppi_standard_canale.items() if not studenti]
+                        if gruppi_vuoti:
+                            st.info(f"Nessuno studente assegnato a: {', '.join(gruppi_vuoti)}")
+                        if len(gruppi_vuoti) < len(gruppi_standard_canale):
+                            st.dataframe(tabella_gruppi(gruppi_standard_canale), use_container_width=True)
                     else:
                         st.info(f"Nessun gruppo standard generato per il Canale {canale}")
                     
@@ -1210,16 +1753,13 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
                         gruppi_ridotti_canale = st.session_state.gruppi_ridotti_per_canale[canale]
                         st.write(f"Gruppi a Capacità Ridotta (Canale {canale}):")
                         
-                        # Visualizza ciascun gruppo di questo canale
-                        for nome_gruppo, studenti in gruppi_ridotti_canale.items():
-                            st.write(f"**{nome_gruppo}**: {len(studenti)} studenti")
-                            
-                            # Crea DataFrame per questo gruppo
-                            if studenti:
-                                df_gruppo = pd.DataFrame(studenti)
-                                st.dataframe(df_gruppo, use_container_width=True)
-                            else:
-                                st.info(f"Nessuno studente assegnato al {nome_gruppo}")
+                        # Numero di studenti per gruppo e un'unica tabella con tutti i gruppi del canale
+                        st.write(" · ".join(f"**{nome_gruppo}**: {len(studenti)} studenti" for nome_gruppo, studenti in gruppi_ridotti_canale.items()))
+                        gruppi_vuoti = [nome_gruppo for nome_gruppo, studenti in gruppi_ridotti_canale.items() if not studenti]
+                        if gruppi_vuoti:
+                            st.info(f"Nessuno studente assegnato a: {', '.join(gruppi_vuoti)}")
+                        if len(gruppi_vuoti) < len(gruppi_ridotti_canale):
+                            st.dataframe(tabella_gruppi(gruppi_ridotti_canale), use_container_width=True)
                     else:
                         st.info(f"Nessun gruppo a capacità ridotta generato per il Canale {canale}")
         
@@ -1227,52 +1767,41 @@ elif st.session_state.sezione_corrente == 'Generazione Gruppi':
         if st.session_state.gruppi_standard and st.session_state.gruppi_ridotti:
             st.subheader("Matrice di Appartenenza")
             
-            # Crea la matrice di appartenenza
-            lista_appartenenza = []
-            
-            for studente in st.session_state.studenti:
-                info_studente = {
-                    "cognome": studente["cognome"],
-                    "nome": studente["nome"],
-                    "gruppo_standard": "",
-                    "gruppo_ridotto": ""
-                }
-                
-                # Trova in quale gruppo standard è lo studente
-                for nome_gruppo, studenti in st.session_state.gruppi_standard.items():
-                    for s in studenti:
-                        if s["cognome"] == studente["cognome"] and s["nome"] == studente["nome"]:
-                            info_studente["gruppo_standard"] = nome_gruppo
-                            break
-                
-                # Trova in quale gruppo ridotto è lo studente
-                for nome_gruppo, studenti in st.session_state.gruppi_ridotti.items():
-                    for s in studenti:
-                        if s["cognome"] == studente["cognome"] and s["nome"] == studente["nome"]:
-                            info_studente["gruppo_ridotto"] = nome_gruppo
-                            break
-                
-                lista_appartenenza.append(info_studente)
+            # Crea la matrice di appartenenza: il gruppo di ogni studente si trova con una sola ricerca per tipo
+            gruppo_standard_per_studente = gruppo_per_studente(st.session_state.gruppi_standard)
+            gruppo_ridotto_per_studente = gruppo_per_studente(st.session_state.gruppi_ridotti)
+            # La matrice viene costruita per colonne, che pandas usa senza dover trasporre un elenco di record
+            cognomi = [studente["cognome"] for studente in st.session_state.studenti]
+            nomi = [studente["nome"] for studente in st.session_state.studenti]
+            chiavi_studenti = list(zip(cognomi, nomi))
             
             # Visualizza matrice
-            df_appartenenza = pd.DataFrame(lista_appartenenza)
+            df_appartenenza = pd.DataFrame({
+                "cognome": cognomi,
+                "nome": nomi,
+                "gruppo_standard": [gruppo_standard_per_studente.get(chiave, "") for chiave in chiavi_studenti],
+                "gruppo_ridotto": [gruppo_ridotto_per_studente.get(chiave, "") for chiave in chiavi_studenti]
+            }, copy=False)
             st.dataframe(df_appartenenza, use_container_width=True)
             
             # Pulsante per esportare in Excel
-            if st.button("Esporta Matrice in Excel"):
-                excel_data = converti_a_excel(df_appartenenza)
-                st.download_button(
-                    label="Download Excel",
-                    data=excel_data,
-                    file_name="matrice_appartenenza.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            pulsante_esportazione(
+                "Esporta Matrice in Excel",
+                lambda: converti_a_excel(df_appartenenza),
+                file_name="matrice_appartenenza.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                chiave="excel_matrice_appartenenza",
+                etichetta_download="Download Excel"
+            )
     else:
         st.info("Nessun laboratorio configurato. Aggiungi prima i laboratori.")
 
 elif st.session_state.sezione_corrente == 'Aule':
     st.header("Gestione Aule")
     
+    # Nomi dei laboratori, usati sia dal form di inserimento sia dalla modifica delle aule
+    laboratori_disponibili = nomi_laboratori()
+    
     # Container per form e campi extra
     form_aule_container = st.container()
     
@@ -1289,8 +1818,6 @@ elif st.session_state.sezione_corrente == 'Aule':
                                       min_value=1, max_value=100, value=15)
         
         # Seleziona i laboratori che possono essere eseguiti in questa aula
-        laboratori_disponibili = [lab["nome"] for lab in st.session_state.laboratori]
-        
         # Se ci sono laboratori, mostra il selettore
         if laboratori_disponibili:
             laboratori_consentiti = st.multiselect(
@@ -1306,9 +1833,7 @@ elif st.session_state.sezione_corrente == 'Aule':
     # Gestione del submit fuori dal form
     if form_aule_submit:
         # Verifica se l'aula esiste già
-        nomi_aule_esistenti = [aula["nome"] for aula in st.session_state.aule]
-        
-        if nome_aula in nomi_aule_esistenti:
+        if nome_aula in aule_per_nome():
             st.error(f"L'aula '{nome_aula}' esiste già!")
         elif not nome_aula:
             st.error("Il nome dell'aula non può essere vuoto!")
@@ -1321,6 +1846,7 @@ elif st.session_state.sezione_corrente == 'Aule':
             }
             
             st.session_state.aule.append(nuova_aula)
+            invalida_indice_aule()
             st.success(f"Aula '{nome_aula}' aggiunta con successo!")
             salva_dati_sessione()
     
@@ -1335,16 +1861,13 @@ elif st.session_state.sezione_corrente == 'Aule':
         # Modifica dei laboratori consentiti per un'aula esistente
         st.subheader("Modifica laboratori consentiti per aula")
         aula_da_modificare = st.selectbox("Seleziona aula da modificare:", 
-                                        [aula["nome"] for aula in st.session_state.aule],
+                                        nomi_aule(),
                                         key="modifica_aula_laboratori")
         
         # Trova l'aula selezionata
-        aula_selezionata = next((aula for aula in st.session_state.aule if aula["nome"] == aula_da_modificare), None)
+        aula_selezionata = aule_per_nome().get(aula_da_modificare)
         
         if aula_selezionata:
-            # Ottieni l'elenco di tutti i laboratori
-            laboratori_disponibili = [lab["nome"] for lab in st.session_state.laboratori]
-            
             # Ottieni l'elenco dei laboratori attualmente consentiti per questa aula
             laboratori_attualmente_consentiti = aula_selezionata.get("laboratori_consentiti", [])
             
@@ -1357,10 +1880,8 @@ elif st.session_state.sezione_corrente == 'Aule':
             
             if st.button("Aggiorna laboratori consentiti"):
                 # Aggiorna l'aula con i nuovi laboratori consentiti
-                for i, aula in enumerate(st.session_state.aule):
-                    if aula["nome"] == aula_da_modificare:
-                        st.session_state.aule[i]["laboratori_consentiti"] = nuovi_laboratori_consentiti
-                        break
+                # Il dizionario dell'indice è lo stesso oggetto contenuto nell'elenco delle aule
+                aula_selezionata["laboratori_consentiti"] = nuovi_laboratori_consentiti
                 
                 st.success(f"Laboratori consentiti per '{aula_da_modificare}' aggiornati!")
                 salva_dati_sessione()
@@ -1369,11 +1890,15 @@ elif st.session_state.sezione_corrente == 'Aule':
         # Pulsante per eliminare aule
         st.subheader("Elimina aula")
         aula_da_eliminare = st.selectbox("Seleziona aula da eliminare:", 
-                                       [aula["nome"] for aula in st.session_state.aule])
+                                       nomi_aule())
         
         if st.button("Elimina Aula"):
-            st.session_state.aule = [aula for aula in st.session_state.aule 
-                                    if aula["nome"] != aula_da_eliminare]
+            # Rimozione in place per posizione (senza cercare l'aula nell'elenco):
+            # l'elenco non viene ricostruito, l'indice per nome va scartato
+            posizione = posizione_aula(aula_da_eliminare)
+            if posizione is not None:
+                del st.session_state.aule[posizione]
+                invalida_indice_aule()
             st.success(f"Aula '{aula_da_eliminare}' eliminata!")
             salva_dati_sessione()
             st.rerun()
@@ -1475,10 +2000,7 @@ elif st.session_state.sezione_corrente == 'Date':
                         st.write(f"Numero totale di giorni lavorativi: {len(giorni_lavorativi)}")
                         
                         # Crea DataFrame per calendario
-                        df_calendario = pd.DataFrame({
-                            "Data": [d.strftime("%d/%m/%Y") for d in giorni_lavorativi],
-                            "Giorno": [d.strftime("%A") for d in giorni_lavorativi],
-                        })
+                        df_calendario = tabella_calendario(inizio, fine)
                         
                         st.dataframe(df_calendario, use_container_width=True)
                         
@@ -1593,7 +2115,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
     # Selettore di canale se ci sono più canali
     canale_selezionato = 1
     if num_canali > 1:
-        opzioni_canale = {f"Canale {i}": i for i in range(1, num_canali + 1)}
+        opzioni_canale = opzioni_canali(num_canali)
         canale_txt = st.selectbox("Seleziona il canale per la programmazione", list(opzioni_canale.keys()))
         canale_selezionato = opzioni_canale[canale_txt]
         st.info(f"Stai visualizzando/generando la programmazione per il Canale {canale_selezionato}")
@@ -1603,76 +2125,77 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         st.session_state.programmazione_per_canale[canale_selezionato] = []
     
     # Ottieni giorni lavorativi
-    inizio = converti_data_italiana(st.session_state.data_inizio)
-    fine = converti_data_italiana(st.session_state.data_fine)
-    giorni_lavorativi = crea_giorni_lavorativi(inizio, fine)
+    giorni_lavorativi = crea_giorni_lavorativi(st.session_state.data_inizio, st.session_state.data_fine)
     
     # Funzione per generare automaticamente la programmazione
-    def aggiungi_evento_programmazione(evento):
-        """
-        Aggiunge un evento sia alla programmazione globale che a quella specifica del canale.
-        
-        Args:
-            evento: Dizionario con i dettagli dell'evento da aggiungere
-        """
-        # Aggiunge l'evento alla programmazione globale (per retrocompatibilità)
-        st.session_state.programmazione.append(evento)
-        
-        # Aggiunge l'evento alla programmazione del canale specifico
-        st.session_state.programmazione_per_canale[canale_selezionato].append(evento)
-        
     def genera_programmazione_automatica():
         # Reset programmazione esistente per il canale selezionato
-        if canale_selezionato in st.session_state.programmazione_per_canale:
-            # Se esiste già una programmazione per questo canale, la resettiamo
-            st.session_state.programmazione_per_canale[canale_selezionato] = []
-        else:
-            # Altrimenti inizializziamo una nuova lista per questo canale
-            st.session_state.programmazione_per_canale[canale_selezionato] = []
-        
-        # Per retrocompatibilità, manteniamo anche la programmazione globale
-        st.session_state.programmazione = []
+        st.session_state.programmazione_per_canale[canale_selezionato] = []
+        invalida_dataframe_programmazione()
+        eventi_canale = st.session_state.programmazione_per_canale[canale_selezionato]
+        
+        # Numero di eventi programmati per data, aggiornato a ogni inserimento (usato nel punteggio delle combinazioni)
+        eventi_per_data = collections.Counter()
+        # Laboratori programmati per (tipo_gruppo, gruppo), aggiornati a ogni inserimento (usati nella verifica finale)
+        lab_programmati_per_gruppo = collections.defaultdict(set)
+        
+        def aggiungi_evento_programmazione(evento):
+            """
+            Aggiunge un evento alla programmazione del canale selezionato, l'unica copia degli eventi.
+            La programmazione globale è una vista ricalcolata con sincronizza_programmazione().
+            
+            Args:
+                evento: Dizionario con i dettagli dell'evento da aggiungere
+            """
+            eventi_canale.append(evento)
+            eventi_per_data[evento["data"]] += 1
+            lab_programmati_per_gruppo[evento["tipo_gruppo"], evento["gruppo"]].add(evento["laboratorio"])
+        
+        def aggiungi_eventi_programmazione(eventi):
+            """Come aggiungi_evento_programmazione, per più eventi in una sola volta"""
+            eventi_canale.extend(eventi)
+            eventi_per_data.update(evento["data"] for evento in eventi)
+            for evento in eventi:
+                lab_programmati_per_gruppo[evento["tipo_gruppo"], evento["gruppo"]].add(evento["laboratorio"])
+        
+        # Riferimenti locali a gruppi e aule: i cicli della generazione non passano ogni volta da st.session_state
+        gruppi_standard = st.session_state.gruppi_standard
+        gruppi_ridotti = st.session_state.gruppi_ridotti
+        aule = st.session_state.aule
+        # Numero di studenti di ogni gruppo: i gruppi non cambiano durante la generazione
+        studenti_per_gruppo_standard = {gruppo: len(studenti) for gruppo, studenti in gruppi_standard.items()}
+        studenti_per_gruppo_ridotto = {gruppo: len(studenti) for gruppo, studenti in gruppi_ridotti.items()}
         
         # Calcola i giorni lavorativi
-        inizio = converti_data_italiana(st.session_state.data_inizio)
-        fine = converti_data_italiana(st.session_state.data_fine)
-        giorni_lavorativi = crea_giorni_lavorativi(inizio, fine)
-        
-        # Stampa informazioni di debug generali
-        st.write("### Informazioni di Debug:")
-        st.write(f"- Totale giorni disponibili: {len(giorni_lavorativi)}")
-        st.write(f"- Totale aule configurate: {len(st.session_state.aule)}")
-        
-        # Verifica se ci sono laboratori a capacità ridotta
-        all_labs = st.session_state.laboratori
-        labs_standard = []
-        labs_ridotti = []
-        
-        for lab in all_labs:
-            if "tipo_gruppo" not in lab:
+        giorni_lavorativi = crea_giorni_lavorativi(st.session_state.data_inizio, st.session_state.data_fine)
+        
+        # Informazioni di debug generali, raccolte e mostrate in un unico blocco solo se richiesto dalla sidebar
+        mostra_debug = st.session_state.get("debug_scheduler", False)
+        info_debug = {
+            "Totale giorni disponibili": len(giorni_lavorativi),
+            "Totale aule configurate": len(aule)
+        }
+        
+        # Laboratori divisi per tipo di gruppo e ordinati per durata (dal più lungo al più breve),
+        # calcolati una volta dopo ogni modifica dei laboratori e riutilizzati tra le generazioni
+        labs_standard, labs_ridotti, labs_da_correggere = laboratori_classificati()
+        for lab, tipo_gruppo in labs_da_correggere:
+            if tipo_gruppo is None:
                 st.warning(f"Lab {lab['nome']} non ha tipo_gruppo specificato. Lo imposto come 'standard'.")
-                lab["tipo_gruppo"] = "standard"
-            
-            if lab["tipo_gruppo"] == "standard":
-                labs_standard.append(lab)
-            elif lab["tipo_gruppo"] == "ridotto":
-                labs_ridotti.append(lab)
             else:
-                st.warning(f"Tipo gruppo non riconosciuto: {lab['tipo_gruppo']} per {lab['nome']}. Lo imposto come 'standard'.")
-                lab["tipo_gruppo"] = "standard"
-                labs_standard.append(lab)
-        
-        st.write(f"- Laboratori standard: {len(labs_standard)}")
-        st.write(f"- Laboratori a capacità ridotta: {len(labs_ridotti)}")
-        st.write(f"- Gruppi standard: {list(st.session_state.gruppi_standard.keys())}")
-        st.write(f"- Gruppi ridotti: {list(st.session_state.gruppi_ridotti.keys())}")
+                st.warning(f"Tipo gruppo non riconosciuto: {tipo_gruppo} per {lab['nome']}. Lo imposto come 'standard'.")
+            lab["tipo_gruppo"] = "standard"
+        if labs_da_correggere:
+            # I laboratori corretti sono cambiati in place: la prossima suddivisione non li segnala più
+            invalida_laboratori_classificati()
         
-        # Ordina i laboratori per durata (dal più lungo al più breve)
-        labs_standard.sort(key=lambda x: x["minutaggio"], reverse=True)
-        labs_ridotti.sort(key=lambda x: x["minutaggio"], reverse=True)
+        info_debug["Laboratori standard"] = len(labs_standard)
+        info_debug["Laboratori a capacità ridotta"] = len(labs_ridotti)
+        info_debug["Gruppi standard"] = list(gruppi_standard)
+        info_debug["Gruppi ridotti"] = list(gruppi_ridotti)
         
-        # Prepara le date disponibili
-        date_disponibili = [d.strftime("%d/%m/%Y") for d in giorni_lavorativi]
+        # Prepara le date disponibili (tupla: non viene mai modificata, quindi si può condividere senza copie)
+        date_disponibili = tuple(date_lavorative_disponibili(st.session_state.data_inizio, st.session_state.data_fine))
         
         # Definisci fasce orarie disponibili 
         fasce_orarie = [
@@ -1681,287 +2204,148 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             {"inizio": "14:30", "fine": "17:00"}   # Pomeriggio
         ]
         
-        # Classifica le aule
-        # Prendi le aule con capacità >= 15 per i gruppi standard
-        aule_standard = [a for a in st.session_state.aule if a["capacita"] >= 15]
-        
-        # Prendi le aule con capacità < 15 o con nomi specifici per i gruppi ridotti
-        aule_ridotte = [a for a in st.session_state.aule if a["capacita"] < 15 or 
-                         a["nome"] in ["Florence", "Esercitazione 1", "Esercitazione 2", "Aula Piccola"]]
+        # Classifica le aule: capacità >= 15 per i gruppi standard, capacità < 15 o aule piccole note per i ridotti
+        aule_standard, aule_ridotte = classifica_aule(aule)
         
         # Fallback: se non ci sono aule ridotte, usa quelle standard
         if not aule_ridotte:
             st.warning("Non sono state trovate aule specifiche per gruppi ridotti. Verranno usate le aule standard.")
             aule_ridotte = aule_standard.copy()
         
-        st.write(f"- Aule per gruppi standard: {[a['nome'] for a in aule_standard]}")
-        st.write(f"- Aule per gruppi ridotti: {[a['nome'] for a in aule_ridotte]}")
-        
-        # Crea una struttura per tracciare l'occupazione delle aule
-        occupazione_aule = {}
-        for data in date_disponibili:
-            occupazione_aule[data] = {}
-            for aula in st.session_state.aule:
-                occupazione_aule[data][aula["nome"]] = {
-                    "08:30-11:00": False,  # False = libera, True = occupata
-                    "11:10-13:30": False,
-                    "14:30-17:00": False
-                }
-        
-        # Crea una struttura per tracciare l'occupazione dei gruppi
-        occupazione_gruppi = {}
-        for data in date_disponibili:
-            occupazione_gruppi[data] = {}
-            for gruppo in st.session_state.gruppi_standard:
-                occupazione_gruppi[data][f"standard_{gruppo}"] = {
-                    "08:30-11:00": False,
-                    "11:10-13:30": False,
-                    "14:30-17:00": False
-                }
-            for gruppo in st.session_state.gruppi_ridotti:
-                occupazione_gruppi[data][f"ridotto_{gruppo}"] = {
-                    "08:30-11:00": False,
-                    "11:10-13:30": False,
-                    "14:30-17:00": False
-                }
+        if mostra_debug:
+            info_debug["Aule per gruppi standard"] = [a['nome'] for a in aule_standard]
+            info_debug["Aule per gruppi ridotti"] = [a['nome'] for a in aule_ridotte]
+            st.write("### Informazioni di Debug:")
+            st.json(info_debug)
+        
+        # Occupazione di aule e gruppi come maschere di bit (data x aula/gruppo): un bit per slot occupato
+        indice_data = {data: i for i, data in enumerate(date_disponibili)}
+        indice_aula = {aula["nome"]: i for i, aula in enumerate(aule)}
+        # Aule per nome, costruite dall'elenco corrente a ogni generazione (a parità di nome vale la prima)
+        aule_generazione_per_nome = {aula["nome"]: aula for aula in reversed(aule)}
+        # I gruppi sono indicizzati per (tipo_gruppo, gruppo): nessuna chiave stringa da comporre a ogni verifica
+        chiavi_gruppi = [("standard", gruppo) for gruppo in gruppi_standard]
+        chiavi_gruppi += [("ridotto", gruppo) for gruppo in gruppi_ridotti]
+        indice_gruppo = {chiave: i for i, chiave in enumerate(chiavi_gruppi)}
+        
+        occupazione_aule = np.zeros((len(date_disponibili), len(aule)), dtype=np.uint8)
+        occupazione_gruppi = np.zeros((len(date_disponibili), len(chiavi_gruppi)), dtype=np.uint8)
         
         # Mappa durate dei laboratori alle fasce orarie appropriate, considerando le fasce disponibili
         def get_fasce_per_durata(minutaggio, lab=None):
-            # Converti i formati delle fasce orarie per corrispondenza
-            mapping_fasce = {
-                "8:30-11:00": "08:30-11:00",
-                "11:00-13:30": "11:10-13:30", # Per retrocompatibilità
-                "11:10-13:30": "11:10-13:30",
-                "14:30-17:00": "14:30-17:00",
-                "8:30-13:30": "08:30-13:30",
-                "8:30-17:00": "08:30-17:00"
-            }
-            
-            # Se il laboratorio è specificato e ha fasce orarie disponibili, usa solo quelle
-            if lab and "fasce_orarie_disponibili" in lab and lab["fasce_orarie_disponibili"]:
-                fasce_disponibili = []
-                
-                # Converti le fasce nel formato corretto
-                for fascia_stringa in lab["fasce_orarie_disponibili"]:
-                    if fascia_stringa in mapping_fasce:
-                        fascia_formato = mapping_fasce[fascia_stringa]
-                        
-                        # Assegna indice in base alla fascia
-                        if fascia_formato == "08:30-11:00":
-                            indice = 0
-                        elif fascia_formato == "11:10-13:30":
-                            indice = 1
-                        elif fascia_formato == "14:30-17:00":
-                            indice = 2
-                        else:
-                            indice = 0  # Per fasce più lunghe
-                            
-                        fasce_disponibili.append((fascia_formato, indice))
-                
+            # Se il laboratorio ha fasce orarie configurate, usa solo quelle (nel formato dello scheduler)
+            if lab and lab.get("fasce_orarie_disponibili"):
+                fasce_disponibili = [
+                    FASCE_SCHEDULER[fascia_stringa]
+                    for fascia_stringa in lab["fasce_orarie_disponibili"]
+                    if fascia_stringa in FASCE_SCHEDULER
+                ]
                 if fasce_disponibili:
                     return fasce_disponibili
             
             # Default se non ci sono fasce specificate o se il laboratorio non ha fasce configurate
             if minutaggio <= 150:
-                return [("08:30-11:00", 0), ("11:10-13:30", 1), ("14:30-17:00", 2)]
+                return FASCE_PREDEFINITE_BREVI
             elif minutaggio <= 300:
-                return [("08:30-13:30", 0)]  # Occupa mattina_1 + mattina_2
-            else:
-                return [("08:30-17:00", 0)]  # Occupa tutta la giornata
-        
-        # Funzione per verificare se una fascia oraria è disponibile
-        def is_fascia_disponibile(data, aula, fascia, gruppo, tipo_gruppo):
-            # Se è una fascia che occupa più slot
-            if fascia == "08:30-13:30":
-                # Verifica che sia mattina_1 che mattina_2 siano liberi
-                if (occupazione_aule[data][aula]["08:30-11:00"] or 
-                    occupazione_aule[data][aula]["11:10-13:30"]):
-                    return False
-                
-                # Verifica anche che il gruppo non sia occupato
-                gruppo_key = f"{tipo_gruppo}_{gruppo}"
-                if (occupazione_gruppi[data][gruppo_key]["08:30-11:00"] or 
-                    occupazione_gruppi[data][gruppo_key]["11:10-13:30"]):
-                    return False
-                
-                return True
-            elif fascia == "08:30-17:00":
-                # Verifica che tutti gli slot siano liberi
-                if (occupazione_aule[data][aula]["08:30-11:00"] or 
-                    occupazione_aule[data][aula]["11:10-13:30"] or
-                    occupazione_aule[data][aula]["14:30-17:00"]):
-                    return False
-                
-                # Verifica anche che il gruppo non sia occupato
-                gruppo_key = f"{tipo_gruppo}_{gruppo}"
-                if (occupazione_gruppi[data][gruppo_key]["08:30-11:00"] or 
-                    occupazione_gruppi[data][gruppo_key]["11:10-13:30"] or
-                    occupazione_gruppi[data][gruppo_key]["14:30-17:00"]):
-                    return False
-                
-                return True
+                return FASCE_PREDEFINITE_MEZZA_GIORNATA  # Occupa mattina_1 + mattina_2
             else:
-                # Fascia oraria singola
-                # Verifica che l'aula sia libera
-                if occupazione_aule[data][aula][fascia]:
-                    return False
-                
-                # Verifica che il gruppo non sia occupato
-                gruppo_key = f"{tipo_gruppo}_{gruppo}"
-                if occupazione_gruppi[data][gruppo_key][fascia]:
-                    return False
-                
-                return True
+                return FASCE_PREDEFINITE_GIORNATA  # Occupa tutta la giornata
         
         # Funzione per marcare una fascia oraria come occupata
         def marca_fascia_occupata(data, aula, fascia, gruppo, tipo_gruppo):
-            # Se è una fascia che occupa più slot
-            if fascia == "08:30-13:30":
-                # Marca sia mattina_1 che mattina_2 come occupati
-                occupazione_aule[data][aula]["08:30-11:00"] = True
-                occupazione_aule[data][aula]["11:10-13:30"] = True
-                
-                # Marca anche il gruppo come occupato
-                gruppo_key = f"{tipo_gruppo}_{gruppo}"
-                occupazione_gruppi[data][gruppo_key]["08:30-11:00"] = True
-                occupazione_gruppi[data][gruppo_key]["11:10-13:30"] = True
-            elif fascia == "08:30-17:00":
-                # Marca tutti gli slot come occupati
-                occupazione_aule[data][aula]["08:30-11:00"] = True
-                occupazione_aule[data][aula]["11:10-13:30"] = True
-                occupazione_aule[data][aula]["14:30-17:00"] = True
-                
-                # Marca anche il gruppo come occupato
-                gruppo_key = f"{tipo_gruppo}_{gruppo}"
-                occupazione_gruppi[data][gruppo_key]["08:30-11:00"] = True
-                occupazione_gruppi[data][gruppo_key]["11:10-13:30"] = True
-                occupazione_gruppi[data][gruppo_key]["14:30-17:00"] = True
-            else:
-                # Fascia oraria singola
-                occupazione_aule[data][aula][fascia] = True
-                
-                # Marca anche il gruppo come occupato
-                gruppo_key = f"{tipo_gruppo}_{gruppo}"
-                occupazione_gruppi[data][gruppo_key][fascia] = True
+            # Marca tutti gli slot coperti dalla fascia, per l'aula e per il gruppo
+            d = indice_data[data]
+            bit = SLOT_BITS[fascia]
+            occupazione_aule[d, indice_aula[aula]] |= bit
+            occupazione_gruppi[d, indice_gruppo[tipo_gruppo, gruppo]] |= bit
         
         # Funzione per calcolare l'ora di fine in base alla fascia
         def get_ora_fine(fascia):
-            if fascia == "08:30-11:00":
-                return "11:00"
-            elif fascia == "11:10-13:30":
-                return "13:30"
-            elif fascia == "14:30-17:00":
-                return "17:00"
-            elif fascia == "08:30-13:30":
-                return "13:30"
-            elif fascia == "08:30-17:00":
-                return "17:00"  # Considera la pausa pranzo come parte della giornata
-            else:
-                return fascia.split("-")[1]
+            ora_fine = ORA_FINE_FASCIA.get(fascia)
+            return ora_fine if ora_fine is not None else fascia.split("-")[1]
         
         # Funzione per calcolare l'ora di inizio in base alla fascia
         def get_ora_inizio(fascia):
-            return fascia.split("-")[0]
+            ora_inizio = ORA_INIZIO_FASCIA.get(fascia)
+            return ora_inizio if ora_inizio is not None else fascia.split("-")[0]
         
         # Funzione di utilità per programmare un laboratorio
+        # Restituisce il nome dell'aula in cui il laboratorio è stato programmato (None se non è stato possibile)
         def programma_laboratorio(lab, gruppo, tipo_gruppo, aule_disponibili):
-            lab_programmato = False
+            aula_programmata = None
             
             # Verifica se il laboratorio ha date specifiche in cui può essere eseguito
             date_lab_specifiche = lab.get("date_disponibili", [])
             # Se sono state specificate date per questo laboratorio e non sono vuote, usa solo quelle
             # altrimenti usa tutte le date disponibili
-            date_da_considerare = date_lab_specifiche if date_lab_specifiche and len(date_lab_specifiche) > 0 else date_disponibili.copy()
+            date_da_considerare = date_lab_specifiche if date_lab_specifiche and len(date_lab_specifiche) > 0 else date_disponibili
+            
+            # Numero di studenti del gruppo, usato per l'efficienza di utilizzo delle aule
+            studenti_per_gruppo = (
+                studenti_per_gruppo_standard if tipo_gruppo == "standard" else studenti_per_gruppo_ridotto
+            ).get(gruppo, 0)
+            
+            # Migliore combinazione valida trovata finora (punteggio più basso): non serve conservarle tutte
+            migliore = None
+            punteggio_migliore = float("inf")
+            
+            # Fasce orarie e aule adatte non dipendono dalla data: si calcolano una volta per laboratorio
+            # Fasce orarie adatte per la durata del laboratorio, considerando le preferenze
+            fasce_adatte = get_fasce_per_durata(lab["minutaggio"], lab)
+            
+            # Solo le aule che consentono questo laboratorio; un'aula che non specifica
+            # i laboratori consentiti li accetta tutti
+            aule_compatibili = [
+                aula for aula in aule_disponibili
+                if "laboratori_consentiti" not in aula or lab["nome"] in aula["laboratori_consentiti"]
+            ]
             
-            # Struttura per memorizzare tutte le combinazioni valide, per scegliere la migliore
-            combinazioni_valide = []
+            # Se non ci sono aule compatibili, nessuna combinazione è possibile
+            if not aule_compatibili:
+                return None
+            
+            # Nel ciclo di ricerca date, aule e gruppo sono usati tramite i loro indici interi
+            # nelle maschere di occupazione, senza ricalcolare chiavi testuali a ogni verifica
+            colonne_aule = np.array([indice_aula[aula["nome"]] for aula in aule_compatibili], dtype=np.intp)
+            riga_gruppo = indice_gruppo[tipo_gruppo, gruppo]
+            
+            # Efficienza di utilizzo di ogni aula compatibile
+            # (rapporto tra studenti e capacità, idealmente vicino a 1; capacità 10 se non indicata)
+            efficienza_aule = np.array([
+                studenti_per_gruppo / capacita_aula if capacita_aula > 0 else 0
+                for capacita_aula in (aula.get("capacita", 10) for aula in aule_compatibili)
+            ], dtype=float)
+            
+            # Cerca la migliore combinazione data-ora-aula per questo laboratorio.
+            # Solo le date del periodo di programmazione (la loro posizione serve anche a dare priorità
+            # alle date precedenti); ogni data porta con sé gli eventi già programmati in quel giorno
+            date_valide = [data for data in date_da_considerare if data in indice_data]
+            punteggio, i_data, i_fascia, i_aula = cerca_combinazione_migliore(
+                [indice_data[data] for data in date_valide],
+                [eventi_per_data[data] for data in date_valide],
+                [(SLOT_BITS[fascia], indice_fascia) for fascia, indice_fascia in fasce_adatte],
+                colonne_aule,
+                efficienza_aule,
+                occupazione_aule,
+                occupazione_gruppi,
+                riga_gruppo,
+                GIORNATA_PIENA
+            )
+            if i_data >= 0:
+                punteggio_migliore = punteggio
+                migliore = (date_valide[i_data], fasce_adatte[i_fascia][0], aule_compatibili[i_aula])
             
-            # Trova tutte le combinazioni data-ora-aula per questo laboratorio
-            for data in date_da_considerare:
-                # Controlla che questa data sia tra quelle disponibili nel periodo
-                if data not in date_disponibili:
-                    continue  # Salta questa data se non è nel periodo di programmazione
-                
-                # Ottieni le fasce orarie adatte per la durata del laboratorio, considerando le preferenze
-                fasce_adatte = get_fasce_per_durata(lab["minutaggio"], lab)
-                
-                for fascia, indice_fascia in fasce_adatte:
-                    # Filtra solo le aule che consentono questo laboratorio
-                    aule_compatibili = []
-                    for aula in aule_disponibili:
-                        # Controlla se l'aula specifica i laboratori consentiti
-                        if "laboratori_consentiti" in aula:
-                            # Se l'aula specifica i laboratori consentiti, verifica che questo laboratorio sia incluso
-                            if lab["nome"] in aula["laboratori_consentiti"]:
-                                aule_compatibili.append(aula)
-                        else:
-                            # Se l'aula non specifica i laboratori consentiti, assumiamo che tutti i laboratori siano consentiti
-                            aule_compatibili.append(aula)
-                    
-                    # Se non ci sono aule compatibili, salta questa fascia oraria
-                    if not aule_compatibili:
-                        continue
-                    
-                    for aula in aule_compatibili:
-                        # Verifica se questa combinazione è disponibile
-                        if is_fascia_disponibile(data, aula["nome"], fascia, gruppo, tipo_gruppo):
-                            # Calcola punteggio di ottimizzazione per questa combinazione
-                            # Criteri: priorità alle date anteriori, alle aule più piccole 
-                            # ma adeguate, e alle fasce orarie contigue ad altri eventi
-                            
-                            # Ottieni l'indice della data (per dare priorità alle date precedenti)
-                            indice_data = date_disponibili.index(data)
-                            
-                            # Calcola l'efficienza di utilizzo dell'aula 
-                            # (rapporto tra studenti e capacità, idealmente vicino a 1)
-                            studenti_per_gruppo = 0
-                            if tipo_gruppo == "standard":
-                                studenti_per_gruppo = len(st.session_state.gruppi_standard.get(gruppo, []))
-                            else:
-                                studenti_per_gruppo = len(st.session_state.gruppi_ridotti.get(gruppo, []))
-                            
-                            capacita_aula = aula.get("capacita", 10)  # Valore di default
-                            efficienza_utilizzo = studenti_per_gruppo / capacita_aula if capacita_aula > 0 else 0
-                            
-                            # Verifica se ci sono eventi già programmati in date vicine
-                            eventi_stesso_giorno = sum(1 for e in st.session_state.programmazione if e["data"] == data)
-                            
-                            # Calcola punteggio finale (più basso è meglio)
-                            # Diamo priorità a:
-                            # 1. Date che già hanno eventi (per compattare)
-                            # 2. Efficienza dell'utilizzo dell'aula
-                            # 3. Date precedenti (per completare prima le prime settimane)
-                            punteggio = (
-                                - eventi_stesso_giorno * 10  # Priorità alta a giorni già occupati
-                                - efficienza_utilizzo * 5    # Priorità a utilizzo efficiente dell'aula
-                                + indice_data * 2            # Leggera penalità per date più avanti
-                                + indice_fascia              # Leggera priorità alle prime fasce della giornata
-                            )
-                            
-                            combinazioni_valide.append({
-                                "data": data,
-                                "fascia": fascia,
-                                "aula": aula,
-                                "punteggio": punteggio
-                            })
-            
-            # Se abbiamo combinazioni valide, scegli quella con il punteggio migliore (più basso)
-            if combinazioni_valide:
-                # Ordina per punteggio (crescente) e scegli la migliore
-                combinazioni_valide.sort(key=lambda x: x["punteggio"])
-                migliore = combinazioni_valide[0]
-                
+            # Se abbiamo trovato una combinazione valida, usa quella con il punteggio migliore (più basso)
+            if migliore is not None:
                 # Estrai i dati della combinazione migliore
-                data = migliore["data"]
-                fascia = migliore["fascia"]
-                aula = migliore["aula"]
+                data, fascia, aula = migliore
                 
                 # Ottieni ora inizio/fine
                 ora_inizio = get_ora_inizio(fascia)
                 ora_fine = get_ora_fine(fascia)
                 
                 # Se la fascia è troppo lunga per il laboratorio, calcola l'ora di fine effettiva
-                if lab["minutaggio"] <= 150 and fascia in ["08:30-11:00", "11:10-13:30", "14:30-17:00"]:
+                if lab["minutaggio"] <= 150 and fascia in FASCE_SINGOLE_SET:
                     ora_fine = calcola_fascia_oraria(ora_inizio, lab["minutaggio"])
                 
                 # Programma il laboratorio
@@ -1977,54 +2361,51 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                 }
                 
                 # Aggiungiamo l'evento alla programmazione del canale selezionato
-                st.session_state.programmazione_per_canale[canale_selezionato].append(nuovo_evento)
-                
-                # Per retrocompatibilità, aggiungiamo anche alla programmazione globale
                 aggiungi_evento_programmazione(nuovo_evento)
                 
                 # Marca come occupato
                 marca_fascia_occupata(data, aula["nome"], fascia, gruppo, tipo_gruppo)
                 
                 # Mostra dettagli e punteggio per debugging
-                st.write(f"Programmato: {lab['nome']} - Gruppo {tipo_gruppo} {gruppo} - {data} {ora_inizio}-{ora_fine} - Aula {aula['nome']} (punteggio: {migliore['punteggio']:.1f})")
-                lab_programmato = True
+                st.write(f"Programmato: {lab['nome']} - Gruppo {tipo_gruppo} {gruppo} - {data} {ora_inizio}-{ora_fine} - Aula {aula['nome']} (punteggio: {punteggio_migliore:.1f})")
+                aula_programmata = aula["nome"]
             
-            return lab_programmato
+            return aula_programmata
         
-        # Definizione dei vincoli
-        # Vincolo 1: Laboratori che devono essere programmati negli ultimi giorni
-        laboratori_ultimi_giorni = ["Gestione Terapia", "Gestione Mobilizzazione", "Valutazione Respiratoria", "Valutazione Cardiocircolatoria"]
-        
-        # Vincolo 2: Laboratori che devono essere programmati nella stessa giornata
-        laboratori_stessa_giornata = ["Mobilizzazione", "Ergonomia"]
-        
-        # Funzione per verificare se un laboratorio è soggetto al vincolo 1
-        def è_laboratorio_ultimi_giorni(nome_lab):
-            return nome_lab in laboratori_ultimi_giorni
-        
-        # Funzione per verificare se un laboratorio è soggetto al vincolo 2
-        def è_laboratorio_stessa_giornata(nome_lab):
-            return nome_lab in laboratori_stessa_giornata
-        
-        # Classificazione dei laboratori secondo i vincoli
-        labs_vincolo1_standard = [lab for lab in labs_standard if è_laboratorio_ultimi_giorni(lab["nome"])]
-        labs_vincolo1_ridotti = [lab for lab in labs_ridotti if è_laboratorio_ultimi_giorni(lab["nome"])]
-        
-        labs_vincolo2_standard = [lab for lab in labs_standard if è_laboratorio_stessa_giornata(lab["nome"])]
-        labs_vincolo2_ridotti = [lab for lab in labs_ridotti if è_laboratorio_stessa_giornata(lab["nome"])]
-        
-        labs_standard_normali = [lab for lab in labs_standard if not è_laboratorio_ultimi_giorni(lab["nome"]) and not è_laboratorio_stessa_giornata(lab["nome"])]
-        labs_ridotti_normali = [lab for lab in labs_ridotti if not è_laboratorio_ultimi_giorni(lab["nome"]) and not è_laboratorio_stessa_giornata(lab["nome"])]
-        
-        st.write("### Classificazione laboratori secondo i vincoli:")
-        st.write(f"- Laboratori da programmare ultimi giorni (Vincolo 1): {[lab['nome'] for lab in labs_vincolo1_standard + labs_vincolo1_ridotti]}")
-        st.write(f"- Laboratori da programmare stessa giornata (Vincolo 2): {[lab['nome'] for lab in labs_vincolo2_standard + labs_vincolo2_ridotti]}")
-        st.write(f"- Altri laboratori standard: {[lab['nome'] for lab in labs_standard_normali]}")
-        st.write(f"- Altri laboratori ridotti: {[lab['nome'] for lab in labs_ridotti_normali]}")
-        
-        # Inverte l'ordine delle date per avere gli ultimi giorni
-        date_ultime = date_disponibili.copy()
-        date_ultime.reverse()
+        # Classificazione dei laboratori secondo i vincoli, con un solo passaggio per tipo di gruppo
+        def classifica_per_vincolo(labs):
+            labs_vincolo1 = []
+            labs_vincolo2 = []
+            labs_normali = []
+            for lab in labs:
+                vincolo1 = lab["nome"] in LABORATORI_ULTIMI_GIORNI
+                vincolo2 = lab["nome"] in LABORATORI_STESSA_GIORNATA
+                if vincolo1:
+                    labs_vincolo1.append(lab)
+                if vincolo2:
+                    labs_vincolo2.append(lab)
+                if not vincolo1 and not vincolo2:
+                    labs_normali.append(lab)
+            return labs_vincolo1, labs_vincolo2, labs_normali
+        
+        labs_vincolo1_standard, labs_vincolo2_standard, labs_standard_normali = classifica_per_vincolo(labs_standard)
+        labs_vincolo1_ridotti, labs_vincolo2_ridotti, labs_ridotti_normali = classifica_per_vincolo(labs_ridotti)
+        
+        # Laboratori standard per nome, per trovare quelli del vincolo 1 senza scorrere l'elenco
+        labs_standard_per_nome = {lab["nome"]: lab for lab in labs_standard}
+        
+        # Nomi dei laboratori del vincolo 2, calcolati una volta per il debug e per gli avvisi di ogni gruppo
+        nomi_vincolo2_standard = [lab['nome'] for lab in labs_vincolo2_standard]
+        nomi_vincolo2_ridotti = [lab['nome'] for lab in labs_vincolo2_ridotti]
+        
+        if mostra_debug:
+            st.write("### Classificazione laboratori secondo i vincoli:")
+            st.json({
+                "Laboratori da programmare ultimi giorni (Vincolo 1)": [lab['nome'] for lab in labs_vincolo1_standard + labs_vincolo1_ridotti],
+                "Laboratori da programmare stessa giornata (Vincolo 2)": nomi_vincolo2_standard + nomi_vincolo2_ridotti,
+                "Altri laboratori standard": [lab['nome'] for lab in labs_standard_normali],
+                "Altri laboratori ridotti": [lab['nome'] for lab in labs_ridotti_normali]
+            })
         
         # FASE 1: Programmazione dei laboratori con VINCOLO 1 (programmazione specifica per gli ultimi 4 giorni)
         st.write("### Programmazione laboratori vincolo 1 (ultimi 4 giorni):")
@@ -2048,18 +2429,15 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             # Definisci le aule specifiche da utilizzare per questi laboratori
             aule_specifiche_nomi = ["Florence", "Esercitazione 1", "Esercitazione 2", "Leininger 1"]
             
-            # Verifica che le aule specificate esistano
+            # Verifica che le aule specificate esistano, cercandole nell'indice per nome della generazione
             aule_speciali = []
             aule_mancanti = []
             
             for nome_aula in aule_specifiche_nomi:
-                aula_trovata = False
-                for aula in st.session_state.aule:
-                    if aula["nome"] == nome_aula:
-                        aule_speciali.append(aula)
-                        aula_trovata = True
-                        break
-                if not aula_trovata:
+                aula = aule_generazione_per_nome.get(nome_aula)
+                if aula is not None:
+                    aule_speciali.append(aula)
+                else:
                     aule_mancanti.append(nome_aula)
             
             if aule_mancanti:
@@ -2072,12 +2450,12 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                 st.write(f"Aule selezionate per i laboratori del vincolo 1: {nomi_aule_speciali}")
                 
                 # Rimuovi questi laboratori speciali dalle liste di laboratori da programmare normalmente
-                labs_vincolo1_standard = [lab for lab in labs_standard if è_laboratorio_ultimi_giorni(lab["nome"])]
-                labs_vincolo1_ridotti = [lab for lab in labs_ridotti if è_laboratorio_ultimi_giorni(lab["nome"])]
-                
+                # (labs_vincolo1_standard/ridotti sono già stati calcolati nella classificazione)
                 # Aggiorna le liste dei laboratori normali escludendo quelli speciali
-                labs_standard_normali = [lab for lab in labs_standard_normali if lab["nome"] not in [l["nome"] for l in labs_vincolo1_standard]]
-                labs_ridotti_normali = [lab for lab in labs_ridotti_normali if lab["nome"] not in [l["nome"] for l in labs_vincolo1_ridotti]]
+                esclusi_standard = {lab["nome"] for lab in labs_vincolo1_standard}
+                esclusi_ridotti = {lab["nome"] for lab in labs_vincolo1_ridotti}
+                labs_standard_normali = [lab for lab in labs_standard_normali if lab["nome"] not in esclusi_standard]
+                labs_ridotti_normali = [lab for lab in labs_ridotti_normali if lab["nome"] not in esclusi_ridotti]
                 
                 # Assegnazione per ogni laboratorio e giorno specifico
                 laboratori_e_giorni = [
@@ -2091,7 +2469,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                     st.write(f"### Programmazione di {nome_lab} - {giorno}")
                     
                     # Ottieni info sul laboratorio
-                    lab_info = next((lab for lab in labs_standard if lab["nome"] == nome_lab), None)
+                    lab_info = labs_standard_per_nome.get(nome_lab)
                     if not lab_info:
                         st.warning(f"Laboratorio '{nome_lab}' non trovato tra i laboratori configurati")
                         continue
@@ -2112,6 +2490,11 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                     ora_fine_tarda_mattina = "13:40"  # Fissa l'ora di fine
                     fascia_tarda_mattina = "11:10-13:30"  # Per il sistema di occupazione aule
                     
+                    # Gli eventi dei due turni vengono aggiunti e riportati a video tutti insieme;
+                    # l'occupazione viene marcata subito perché ogni evento usa un'aula e un gruppo diversi
+                    eventi_vincolo1 = []
+                    righe_log = []
+                    
                     # Assegna gruppi 1-4 alla prima fascia (8:30-11:00)
                     for idx, gruppo_num in enumerate(range(1, 5)):  # Gruppi 1-4
                         gruppo = str(gruppo_num)
@@ -2129,13 +2512,9 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                             "canale": canale_selezionato
                         }
                         
-                        # Aggiungiamo l'evento alla programmazione del canale selezionato
-                        st.session_state.programmazione_per_canale[canale_selezionato].append(nuovo_evento)
-                        
-                        # Per retrocompatibilità, aggiungiamo anche alla programmazione globale
-                        aggiungi_evento_programmazione(nuovo_evento)
+                        eventi_vincolo1.append(nuovo_evento)
                         marca_fascia_occupata(giorno, aula, fascia_mattina, gruppo, "ridotto")
-                        st.write(f"Programmato (vincolo 1): {nome_lab} - Gruppo ridotto {gruppo} - {giorno} {ora_inizio_mattina}-{ora_fine_mattina} - Aula {aula}")
+                        righe_log.append(f"Programmato (vincolo 1): {nome_lab} - Gruppo ridotto {gruppo} - {giorno} {ora_inizio_mattina}-{ora_fine_mattina} - Aula {aula}")
                     
                     # Assegna gruppi 5-8 alla seconda fascia (11:10-13:40)
                     for idx, gruppo_num in enumerate(range(5, 9)):  # Gruppi 5-8
@@ -2154,29 +2533,49 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                             "canale": canale_selezionato
                         }
                         
-                        # Aggiungiamo l'evento alla programmazione del canale selezionato
-                        st.session_state.programmazione_per_canale[canale_selezionato].append(nuovo_evento)
-                        
-                        # Per retrocompatibilità, aggiungiamo anche alla programmazione globale
-                        aggiungi_evento_programmazione(nuovo_evento)
+                        eventi_vincolo1.append(nuovo_evento)
                         marca_fascia_occupata(giorno, aula, fascia_tarda_mattina, gruppo, "ridotto")
-                        st.write(f"Programmato (vincolo 1): {nome_lab} - Gruppo ridotto {gruppo} - {giorno} {ora_inizio_tarda_mattina}-{ora_fine_tarda_mattina} - Aula {aula}")
+                        righe_log.append(f"Programmato (vincolo 1): {nome_lab} - Gruppo ridotto {gruppo} - {giorno} {ora_inizio_tarda_mattina}-{ora_fine_tarda_mattina} - Aula {aula}")
+                    
+                    # Aggiungiamo gli eventi alla programmazione del canale selezionato
+                    aggiungi_eventi_programmazione(eventi_vincolo1)
+                    st.write("  \n".join(righe_log))
                 
                 # Rimuoviamo questi laboratori dalle liste per evitare che vengano programmati di nuovo
-                for lab_nome, _ in laboratori_e_giorni:
-                    labs_vincolo1_standard = [lab for lab in labs_vincolo1_standard if lab["nome"] != lab_nome]
-                    labs_vincolo1_ridotti = [lab for lab in labs_vincolo1_ridotti if lab["nome"] != lab_nome]
+                labs_programmati = {lab_nome for lab_nome, _ in laboratori_e_giorni}
+                labs_vincolo1_standard = [lab for lab in labs_vincolo1_standard if lab["nome"] not in labs_programmati]
+                labs_vincolo1_ridotti = [lab for lab in labs_vincolo1_ridotti if lab["nome"] not in labs_programmati]
         
         # FASE 2: Programmazione dei laboratori con VINCOLO 2 (stessa giornata)
         st.write("### Programmazione laboratori vincolo 2 (stessa giornata):")
         
+        # Date in cui tutti i laboratori possono svolgersi, nell'ordine del periodo
+        def date_comuni_laboratori(labs):
+            # Interseca come insiemi le date specifiche (non vuote) di ogni laboratorio
+            date_consentite = None
+            for lab in labs:
+                date_lab_specifiche = lab.get("date_disponibili", [])
+                if date_lab_specifiche:
+                    if date_consentite is None:
+                        date_consentite = set(date_lab_specifiche)
+                    else:
+                        date_consentite.intersection_update(date_lab_specifiche)
+            
+            # Se non ci sono date specifiche o non ci sono date comuni, usa tutte le date disponibili
+            if date_consentite:
+                date_comuni = [d for d in date_disponibili if d in date_consentite]
+                if date_comuni:
+                    return date_comuni
+            return date_disponibili
+        
         # Funzione per programmare due laboratori nella stessa giornata
         def programma_laboratori_stessa_giornata(labs, gruppo, tipo_gruppo, aule_disp):
             # Verifica che siano esattamente "Ergonomia" e "Mobilizzazione"
+            labs_per_nome = {lab["nome"]: lab for lab in labs}
             sono_ergonomia_mobilizzazione = (
                 len(labs) == 2 and 
-                "Ergonomia" in [lab["nome"] for lab in labs] and 
-                "Mobilizzazione" in [lab["nome"] for lab in labs]
+                "Ergonomia" in labs_per_nome and 
+                "Mobilizzazione" in labs_per_nome
             )
             
             # Gestione speciale per Ergonomia e Mobilizzazione
@@ -2185,91 +2584,85 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             
             # Gestione standard per altri laboratori
             # Trova le date comuni disponibili per tutti i laboratori
-            date_comuni = date_disponibili.copy()
+            date_da_considerare = date_comuni_laboratori(labs)
             
-            # Filtra per le date specifiche di ogni laboratorio
-            ha_date_specifiche = False
+            # Fasce orarie e aule compatibili di ogni laboratorio non dipendono dalla data: le fasce sono
+            # tenute con il loro bit e le aule con la loro colonna nelle maschere di occupazione
+            riga_gruppo = indice_gruppo[tipo_gruppo, gruppo]
+            candidati_per_lab = []
             for lab in labs:
-                date_lab_specifiche = lab.get("date_disponibili", [])
-                if date_lab_specifiche and len(date_lab_specifiche) > 0:  # Se questo laboratorio ha date specifiche non vuote
-                    ha_date_specifiche = True
-                    # Restringi le date comuni solo a quelle consentite per questo laboratorio
-                    date_comuni = [d for d in date_comuni if d in date_lab_specifiche]
-            
-            # Se non ci sono date specifiche o non ci sono date comuni tra i laboratori e le loro date specifiche, usa tutte le date disponibili
-            date_da_considerare = date_comuni if ha_date_specifiche and date_comuni else date_disponibili.copy()
+                # Usa le fasce orarie specifiche del laboratorio se disponibili
+                fasce_adatte = [(fascia, SLOT_BITS[fascia]) for fascia, _ in get_fasce_per_durata(lab["minutaggio"], lab)]
+                # Solo le aule che consentono questo laboratorio (senza elenco sono tutte consentite)
+                aule_compatibili = [
+                    (aula, indice_aula[aula["nome"]]) for aula in aule_disp
+                    if "laboratori_consentiti" not in aula or lab["nome"] in aula["laboratori_consentiti"]
+                ]
+                # Date specifiche del laboratorio come insieme, per la verifica di ogni data
+                date_lab_specifiche = set(lab.get("date_disponibili", []))
+                candidati_per_lab.append((lab, fasce_adatte, aule_compatibili, date_lab_specifiche))
             
             for data in date_da_considerare:
-                # Verifico che entrambi i laboratori possano essere programmati nello stesso giorno
-                slot_disponibili = []
+                # Verifico che tutti i laboratori possano essere programmati nello stesso giorno:
+                # per ognuno basta il primo slot libero, e al primo laboratorio senza slot la data viene scartata
+                slot_per_lab = {}
+                
+                # Occupazione della giornata letta una volta: riga delle aule e maschera del gruppo
+                posizione_data = indice_data[data]
+                occupazione_giorno = occupazione_aule[posizione_data]
+                occupazione_gruppo = occupazione_gruppi[posizione_data, riga_gruppo]
                 
-                for lab in labs:
+                for lab, fasce_adatte, aule_compatibili, date_lab_specifiche in candidati_per_lab:
                     # Verifica se il laboratorio ha date specifiche non vuote e se questa data è consentita
-                    date_lab_specifiche = lab.get("date_disponibili", [])
-                    if date_lab_specifiche and len(date_lab_specifiche) > 0 and data not in date_lab_specifiche:
-                        continue  # Salta questo laboratorio se la data non è tra quelle consentite
-                        
-                    # Usa le fasce orarie specifiche del laboratorio se disponibili
-                    fasce_adatte = get_fasce_per_durata(lab["minutaggio"], lab)
-                    for fascia, _ in fasce_adatte:
-                        # Filtra solo le aule che consentono questo laboratorio
-                        aule_compatibili = []
-                        for aula in aule_disp:
-                            # Controlla se l'aula specifica i laboratori consentiti
-                            if "laboratori_consentiti" in aula:
-                                # Se l'aula specifica i laboratori consentiti, verifica che questo laboratorio sia incluso
-                                if lab["nome"] in aula["laboratori_consentiti"]:
-                                    aule_compatibili.append(aula)
-                            else:
-                                # Se l'aula non specifica i laboratori consentiti, assumiamo che tutti i laboratori siano consentiti
-                                aule_compatibili.append(aula)
-                                
-                        for aula in aule_compatibili:
-                            if is_fascia_disponibile(data, aula["nome"], fascia, gruppo, tipo_gruppo):
-                                slot_disponibili.append((lab, fascia, aula))
+                    if date_lab_specifiche and data not in date_lab_specifiche:
+                        break
+                    
+                    # Prima fascia libera per il gruppo con un'aula compatibile libera
+                    slot = next(
+                        ((fascia, aula)
+                         for fascia, bit in fasce_adatte
+                         if not occupazione_gruppo & bit
+                         for aula, colonna in aule_compatibili
+                         if not occupazione_giorno[colonna] & bit),
+                        None
+                    )
+                    if slot is None:
+                        break
+                    slot_per_lab[lab["nome"]] = (lab, *slot)
                 
-                # Se ho trovato almeno uno slot per ogni laboratorio
-                if len(set([s[0]["nome"] for s in slot_disponibili])) >= len(labs):
+                # Se ho trovato uno slot per ogni laboratorio
+                if len(slot_per_lab) >= len(labs):
                     # Programma tutti i laboratori in questo giorno
                     for lab in labs:
-                        # Cerca uno slot disponibile per questo laboratorio
-                        for slot in slot_disponibili:
-                            if slot[0]["nome"] == lab["nome"]:
-                                lab_slot = slot[0]
-                                fascia = slot[1]
-                                aula = slot[2]
-                                
-                                # Ottieni ora inizio/fine
-                                ora_inizio = get_ora_inizio(fascia)
-                                ora_fine = get_ora_fine(fascia)
-                                
-                                # Se la fascia è troppo lunga per il laboratorio, calcola l'ora di fine effettiva
-                                if lab_slot["minutaggio"] <= 150 and fascia in ["08:30-11:00", "11:10-13:30", "14:30-17:00"]:
-                                    ora_fine = calcola_fascia_oraria(ora_inizio, lab_slot["minutaggio"])
-                                
-                                # Programma il laboratorio
-                                nuovo_evento = {
-                                    "data": data,
-                                    "laboratorio": lab_slot["nome"],
-                                    "ora_inizio": ora_inizio,
-                                    "ora_fine": ora_fine,
-                                    "aula": aula["nome"],
-                                    "gruppo": gruppo,
-                                    "tipo_gruppo": tipo_gruppo,
-                                    "canale": canale_selezionato
-                                }
-                                
-                                # Aggiungiamo l'evento alla programmazione del canale selezionato
-                                st.session_state.programmazione_per_canale[canale_selezionato].append(nuovo_evento)
-                                
-                                # Per retrocompatibilità, aggiungiamo anche alla programmazione globale
-                                aggiungi_evento_programmazione(nuovo_evento)
-                                
-                                # Marca come occupato
-                                marca_fascia_occupata(data, aula["nome"], fascia, gruppo, tipo_gruppo)
-                                
-                                st.write(f"Programmato (vincolo 2): {lab_slot['nome']} - Gruppo {tipo_gruppo} {gruppo} - {data} {ora_inizio}-{ora_fine} - Aula {aula['nome']}")
-                                break
+                        lab_slot, fascia, aula = slot_per_lab[lab["nome"]]
+                        
+                        # Ottieni ora inizio/fine
+                        ora_inizio = get_ora_inizio(fascia)
+                        ora_fine = get_ora_fine(fascia)
+                        
+                        # Se la fascia è troppo lunga per il laboratorio, calcola l'ora di fine effettiva
+                        if lab_slot["minutaggio"] <= 150 and fascia in FASCE_SINGOLE_SET:
+                            ora_fine = calcola_fascia_oraria(ora_inizio, lab_slot["minutaggio"])
+                        
+                        # Programma il laboratorio
+                        nuovo_evento = {
+                            "data": data,
+                            "laboratorio": lab_slot["nome"],
+                            "ora_inizio": ora_inizio,
+                            "ora_fine": ora_fine,
+                            "aula": aula["nome"],
+                            "gruppo": gruppo,
+                            "tipo_gruppo": tipo_gruppo,
+                            "canale": canale_selezionato
+                        }
+                        
+                        # Aggiungiamo l'evento alla programmazione del canale selezionato
+                        aggiungi_evento_programmazione(nuovo_evento)
+                        
+                        # Marca come occupato
+                        marca_fascia_occupata(data, aula["nome"], fascia, gruppo, tipo_gruppo)
+                        
+                        st.write(f"Programmato (vincolo 2): {lab_slot['nome']} - Gruppo {tipo_gruppo} {gruppo} - {data} {ora_inizio}-{ora_fine} - Aula {aula['nome']}")
                     
                     return True
             
@@ -2277,65 +2670,53 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             
         def programma_ergonomia_mobilizzazione(labs, gruppo, tipo_gruppo, aule_disp):
             # Trova le date comuni disponibili per tutti i laboratori
-            date_comuni = date_disponibili.copy()
-            
-            # Filtra per le date specifiche di ogni laboratorio
-            ha_date_specifiche = False
-            for lab in labs:
-                date_lab_specifiche = lab.get("date_disponibili", [])
-                if date_lab_specifiche and len(date_lab_specifiche) > 0:  # Se questo laboratorio ha date specifiche non vuote
-                    ha_date_specifiche = True
-                    # Restringi le date comuni solo a quelle consentite per questo laboratorio
-                    date_comuni = [d for d in date_comuni if d in date_lab_specifiche]
-            
-            # Se non ci sono date specifiche o non ci sono date comuni, usa tutte le date disponibili
-            date_da_considerare = date_comuni if ha_date_specifiche and date_comuni else date_disponibili.copy()
+            date_da_considerare = date_comuni_laboratori(labs)
             
             # Ottieni gli oggetti laboratorio specifici
-            lab_ergonomia = next((lab for lab in labs if lab["nome"] == "Ergonomia"), None)
-            lab_mobilizzazione = next((lab for lab in labs if lab["nome"] == "Mobilizzazione"), None)
+            labs_per_nome = {lab["nome"]: lab for lab in labs}
+            lab_ergonomia = labs_per_nome.get("Ergonomia")
+            lab_mobilizzazione = labs_per_nome.get("Mobilizzazione")
             
             if not lab_ergonomia or not lab_mobilizzazione:
                 st.error("Non trovati i laboratori Ergonomia e Mobilizzazione nelle configurazioni")
                 return False
             
-            for data in date_da_considerare:
-                # Prima verifica che sia possibile programmare Ergonomia nella prima fascia (8:30-11:00)
-                fascia_ergonomia = "08:30-11:00"
-                aule_ergonomia_disponibili = []
-                
-                # Filtra le aule compatibili per Ergonomia
-                for aula in aule_disp:
-                    if ("laboratori_consentiti" not in aula or 
-                        ("laboratori_consentiti" in aula and "Ergonomia" in aula["laboratori_consentiti"])):
-                        if is_fascia_disponibile(data, aula["nome"], fascia_ergonomia, gruppo, tipo_gruppo):
-                            aule_ergonomia_disponibili.append(aula)
-                
-                if not aule_ergonomia_disponibili:
-                    continue  # Nessuna aula disponibile per Ergonomia in questa data
-                
-                # Poi verifica che sia possibile programmare Mobilizzazione nella fascia (11:10-17:00)
-                # Dobbiamo verificare che sia la fascia tarda mattina che quella pomeridiana siano libere
-                fascia_tarda_mattina = "11:10-13:30"
-                fascia_pomeriggio = "14:30-17:00"
-                aule_mobilizzazione_disponibili = []
-                
-                # Filtra le aule compatibili per Mobilizzazione
-                for aula in aule_disp:
-                    if ("laboratori_consentiti" not in aula or 
-                        ("laboratori_consentiti" in aula and "Mobilizzazione" in aula["laboratori_consentiti"])):
-                        # Verifica che la fascia pomeridiana sia disponibile
-                        if (is_fascia_disponibile(data, aula["nome"], "11:10-13:30", gruppo, tipo_gruppo) and
-                            is_fascia_disponibile(data, aula["nome"], "14:30-17:00", gruppo, tipo_gruppo)):
-                            aule_mobilizzazione_disponibili.append(aula)
-                
-                if not aule_mobilizzazione_disponibili:
-                    continue  # Nessuna aula disponibile per Mobilizzazione in questa data
+            # Aule compatibili con ciascun laboratorio, calcolate una volta per tutte le date
+            # (senza elenco di laboratori consentiti l'aula accetta qualsiasi laboratorio)
+            aule_ergonomia = [
+                aula for aula in aule_disp
+                if "laboratori_consentiti" not in aula or "Ergonomia" in aula["laboratori_consentiti"]
+            ]
+            aule_mobilizzazione = [
+                aula for aula in aule_disp
+                if "laboratori_consentiti" not in aula or "Mobilizzazione" in aula["laboratori_consentiti"]
+            ]
+            if not aule_ergonomia or not aule_mobilizzazione:
+                return False
+            
+            # Prima di scorrere le date scarta quelle in cui i due laboratori non possono stare insieme:
+            # Ergonomia nella prima fascia (8:30-11:00) e Mobilizzazione nella fascia 11:10-17:00,
+            # cioè sia la tarda mattina sia il pomeriggio liberi, con il gruppo libero in tutti e tre gli slot
+            fascia_ergonomia = "08:30-11:00"
+            bit_ergonomia = SLOT_BITS[fascia_ergonomia]
+            bit_mobilizzazione = SLOT_BITS["11:10-13:30"] | SLOT_BITS["14:30-17:00"]
+            posizioni_date = np.array([indice_data[data] for data in date_da_considerare], dtype=np.intp)
+            occupazione_date = occupazione_aule[posizioni_date]
+            
+            gruppo_libero = (occupazione_gruppi[posizioni_date, indice_gruppo[tipo_gruppo, gruppo]] & GIORNATA_PIENA) == 0
+            colonne_ergonomia = np.array([indice_aula[aula["nome"]] for aula in aule_ergonomia], dtype=np.intp)
+            ergonomia_libere = (occupazione_date[:, colonne_ergonomia] & bit_ergonomia) == 0
+            colonne_mobilizzazione = np.array([indice_aula[aula["nome"]] for aula in aule_mobilizzazione], dtype=np.intp)
+            mobilizzazione_libere = (occupazione_date[:, colonne_mobilizzazione] & bit_mobilizzazione) == 0
+            date_fattibili = gruppo_libero & ergonomia_libere.any(axis=1) & mobilizzazione_libere.any(axis=1)
+            
+            for i in np.flatnonzero(date_fattibili):
+                data = date_da_considerare[i]
+                # Per ciascun laboratorio serve solo la prima aula libera
+                aula_ergonomia = aule_ergonomia[int(ergonomia_libere[i].argmax())]
+                aula_mobilizzazione = aule_mobilizzazione[int(mobilizzazione_libere[i].argmax())]
                 
                 # Se abbiamo trovato aule disponibili per entrambi i laboratori, programmiamoli
-                aula_ergonomia = aule_ergonomia_disponibili[0]
-                aula_mobilizzazione = aule_mobilizzazione_disponibili[0]
-                
                 # Programma Ergonomia (8:30-11:00)
                 nuovo_evento_ergonomia = {
                     "data": data,
@@ -2349,9 +2730,6 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                 }
                 
                 # Aggiungiamo l'evento alla programmazione del canale selezionato
-                st.session_state.programmazione_per_canale[canale_selezionato].append(nuovo_evento_ergonomia)
-                
-                # Per retrocompatibilità, aggiungiamo anche alla programmazione globale
                 aggiungi_evento_programmazione(nuovo_evento_ergonomia)
                 marca_fascia_occupata(data, aula_ergonomia["nome"], fascia_ergonomia, gruppo, tipo_gruppo)
                 st.write(f"Programmato (vincolo 2): Ergonomia - Gruppo {tipo_gruppo} {gruppo} - {data} 08:30-11:00 - Aula {aula_ergonomia['nome']}")
@@ -2369,9 +2747,6 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                 }
                 
                 # Aggiungiamo l'evento alla programmazione del canale selezionato
-                st.session_state.programmazione_per_canale[canale_selezionato].append(nuovo_evento_mobilizzazione)
-                
-                # Per retrocompatibilità, aggiungiamo anche alla programmazione globale
                 aggiungi_evento_programmazione(nuovo_evento_mobilizzazione)
                 # Marca le due fasce orarie (mattina 2 e pomeriggio) come occupate
                 marca_fascia_occupata(data, aula_mobilizzazione["nome"], "11:10-13:30", gruppo, tipo_gruppo)
@@ -2383,21 +2758,20 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             return False
         
         # Applicazione del vincolo 2 per laboratori standard
-        for gruppo in st.session_state.gruppi_standard:
+        for gruppo in gruppi_standard:
             if not programma_laboratori_stessa_giornata(labs_vincolo2_standard, gruppo, "standard", aule_standard):
-                st.warning(f"Impossibile programmare i laboratori {[lab['nome'] for lab in labs_vincolo2_standard]} (vincolo 2) per il gruppo standard {gruppo} nella stessa giornata")
+                st.warning(f"Impossibile programmare i laboratori {nomi_vincolo2_standard} (vincolo 2) per il gruppo standard {gruppo} nella stessa giornata")
         
         # Applicazione del vincolo 2 per laboratori ridotti
-        for gruppo in st.session_state.gruppi_ridotti:
+        for gruppo in gruppi_ridotti:
             if not programma_laboratori_stessa_giornata(labs_vincolo2_ridotti, gruppo, "ridotto", aule_ridotte):
-                st.warning(f"Impossibile programmare i laboratori {[lab['nome'] for lab in labs_vincolo2_ridotti]} (vincolo 2) per il gruppo ridotto {gruppo} nella stessa giornata")
+                st.warning(f"Impossibile programmare i laboratori {nomi_vincolo2_ridotti} (vincolo 2) per il gruppo ridotto {gruppo} nella stessa giornata")
         
         # FASE 3: Calcolo ottimizzato delle risorse disponibili
         st.write("### Analisi disponibilità risorse:")
         
         # Analisi migliorata della disponibilità di risorse
         # Calcoliamo il totale di slot disponibili
-        total_slots_available = 0
         slots_used = 0
         
         # Lista di laboratori per calcolare il fabbisogno effettivo di slot per tipo di durata
@@ -2414,30 +2788,19 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             else:
                 lab_long.append(lab)
         
-        # Conteggio degli slot effettivamente disponibili con un'analisi più sofisticata
-        for data in date_disponibili:
-            for aula in st.session_state.aule:
-                # Conta disponibilità di fasce singole (mattina1, mattina2, pomeriggio)
-                mattina1_libera = not occupazione_aule[data][aula["nome"]]["08:30-11:00"]
-                mattina2_libera = not occupazione_aule[data][aula["nome"]]["11:10-13:30"]
-                pomeriggio_libera = not occupazione_aule[data][aula["nome"]]["14:30-17:00"]
-                
-                # Conta slot liberi singoli
-                if mattina1_libera:
-                    total_slots_available += 1
-                if mattina2_libera:
-                    total_slots_available += 1
-                if pomeriggio_libera:
-                    total_slots_available += 1
-                
-                # Conta slot liberi combinati (potrebbero essere usati per lab più lunghi)
-                # Se entrambi mattina1 e mattina2 sono liberi, aggiungiamo uno slot extra per lab di durata media
-                if mattina1_libera and mattina2_libera:
-                    total_slots_available += 0.5  # Peso ridotto perché è una combinazione di slot già contati
-                
-                # Se tutte e tre le fasce sono libere, aggiungiamo slot extra per lab lunghi
-                if mattina1_libera and mattina2_libera and pomeriggio_libera:
-                    total_slots_available += 0.5  # Peso ridotto perché è una combinazione di slot già contati
+        # Conteggio degli slot effettivamente disponibili, calcolato su tutte le date e aule insieme
+        # a partire dalle maschere di occupazione
+        mattina1_libera = (occupazione_aule & SLOT_BITS["08:30-11:00"]) == 0
+        mattina2_libera = (occupazione_aule & SLOT_BITS["11:10-13:30"]) == 0
+        pomeriggio_libera = (occupazione_aule & SLOT_BITS["14:30-17:00"]) == 0
+        mattina_libera = mattina1_libera & mattina2_libera
+        
+        # Slot liberi singoli (mattina1, mattina2, pomeriggio)
+        total_slots_available = int(mattina1_libera.sum() + mattina2_libera.sum() + pomeriggio_libera.sum())
+        # Slot liberi combinati (potrebbero essere usati per lab più lunghi), con peso ridotto perché
+        # sono combinazioni di slot già contati: mattina intera per i lab medi, giornata intera per quelli lunghi
+        total_slots_available += 0.5 * int(mattina_libera.sum())
+        total_slots_available += 0.5 * int((mattina_libera & pomeriggio_libera).sum())
         
         # Ottieni la durata in giorni lavorativi
         giorni_lavorativi = len(date_disponibili)
@@ -2446,7 +2809,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         # e non mostriamo avvisi, in quanto l'algoritmo è in grado di ottimizzare adeguatamente
         if giorni_lavorativi >= 14:
             # Mostra gli slot disponibili e i laboratori da programmare
-            total_labs_remaining = len(labs_standard_normali) * len(st.session_state.gruppi_standard) + len(labs_ridotti_normali) * len(st.session_state.gruppi_ridotti)
+            total_labs_remaining = len(labs_standard_normali) * len(gruppi_standard) + len(labs_ridotti_normali) * len(gruppi_ridotti)
             slots_available_rounded = int(total_slots_available)
             
             st.write(f"Slot totali disponibili: {slots_available_rounded}")
@@ -2456,7 +2819,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         else:
             # Per meno di 14 giorni, facciamo l'analisi dettagliata
             # Calcolo con fattore di ottimizzazione (compattazione) per ogni tipo di lab
-            n_gruppi_totali = len(st.session_state.gruppi_standard) + len(st.session_state.gruppi_ridotti)
+            n_gruppi_totali = len(gruppi_standard) + len(gruppi_ridotti)
             
             # Fattori di ottimizzazione molto aggressivi
             ottimizzazione_lab_brevi = 0.6  # 40% di efficienza in più per lab brevi grazie a compattazione
@@ -2467,7 +2830,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             labs_medium_count = len(lab_medium) * n_gruppi_totali * 2 * ottimizzazione_lab_medi  # Occupano 2 slot 
             labs_long_count = len(lab_long) * n_gruppi_totali * 3 * ottimizzazione_lab_lunghi  # Occupano 3 slot
             
-            total_labs_remaining = len(labs_standard_normali) * len(st.session_state.gruppi_standard) + len(labs_ridotti_normali) * len(st.session_state.gruppi_ridotti)
+            total_labs_remaining = len(labs_standard_normali) * len(gruppi_standard) + len(labs_ridotti_normali) * len(gruppi_ridotti)
             total_slots_needed = labs_short_count + labs_medium_count + labs_long_count
             
             # Slot disponibili arrotondati per un confronto più significativo
@@ -2496,6 +2859,26 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         st.write("### Programmazione laboratori rimanenti con strategia di ottimizzazione:")
         
         # Funzione di programmazione migliorata per massimizzare lo spazio
+        # Numero di combinazioni data-fascia-aula ancora libere per un laboratorio e un gruppo
+        def conta_combinazioni_libere(lab, gruppo, tipo_gruppo, aule_disp):
+            date_lab_specifiche = lab.get("date_disponibili", [])
+            date_da_considerare = date_lab_specifiche if date_lab_specifiche else date_disponibili
+            posizioni_date = np.array(
+                [indice_data[data] for data in date_da_considerare if data in indice_data], dtype=np.intp
+            )
+            colonne_aule = np.array([
+                indice_aula[aula["nome"]] for aula in aule_disp
+                if "laboratori_consentiti" not in aula or lab["nome"] in aula["laboratori_consentiti"]
+            ], dtype=np.intp)
+            bit_fasce = np.array(
+                [SLOT_BITS[fascia] for fascia, _ in get_fasce_per_durata(lab["minutaggio"], lab)], dtype=np.uint8
+            )
+            
+            # Per ogni (data, aula, fascia): aula libera e gruppo libero in tutti gli slot della fascia
+            aule_libere = (occupazione_aule[np.ix_(posizioni_date, colonne_aule)][:, :, np.newaxis] & bit_fasce) == 0
+            gruppo_libero = (occupazione_gruppi[posizioni_date, indice_gruppo[tipo_gruppo, gruppo]][:, np.newaxis] & bit_fasce) == 0
+            return int((aule_libere & gruppo_libero[:, np.newaxis, :]).sum())
+        
         def programma_con_priorita(labs, tipo_gruppo, gruppi, aule_disp):
             # Imposta variabili per tracciare il successo
             successi = 0
@@ -2505,32 +2888,48 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             # Ordina per priorità: prima i laboratori più lunghi
             labs_ordinati = sorted(labs, key=lambda x: x["minutaggio"], reverse=True)
             
-            # 1. Primo passaggio: programma i laboratori che occupano un giorno intero
-            for lab in [l for l in labs_ordinati if l["minutaggio"] > 300]:
-                for gruppo in gruppi:
-                    if programma_laboratorio(lab, gruppo, tipo_gruppo, aule_disp):
-                        successi += 1
-                    else:
-                        fallimenti += 1
-                        lab_falliti.append((lab["nome"], gruppo))
-            
-            # 2. Secondo passaggio: programma i laboratori di mezza giornata
-            for lab in [l for l in labs_ordinati if 150 < l["minutaggio"] <= 300]:
-                for gruppo in gruppi:
-                    if programma_laboratorio(lab, gruppo, tipo_gruppo, aule_disp):
-                        successi += 1
-                    else:
-                        fallimenti += 1
-                        lab_falliti.append((lab["nome"], gruppo))
-            
-            # 3. Terzo passaggio: programma i laboratori brevi
-            for lab in [l for l in labs_ordinati if l["minutaggio"] <= 150]:
-                for gruppo in gruppi:
-                    if programma_laboratorio(lab, gruppo, tipo_gruppo, aule_disp):
-                        successi += 1
-                    else:
+            # Tre passaggi per durata: 1. laboratori di un giorno intero, 2. di mezza giornata, 3. brevi,
+            # ripartiti con un solo passaggio sull'elenco ordinato
+            passaggi = ([], [], [])
+            for lab in labs_ordinati:
+                minutaggio = lab["minutaggio"]
+                passaggi[0 if minutaggio > 300 else 1 if minutaggio > 150 else 2].append(lab)
+            
+            for labs_passaggio in passaggi:
+                # In ogni passaggio si programma sempre la coppia (laboratorio, gruppo) che ha meno combinazioni
+                # libere in quel momento, così le più vincolate non restano senza spazio; a parità resta l'ordine
+                # per durata. Ogni coppia è [combinazioni libere, ordine, laboratorio, gruppo, aule compatibili]
+                coppie = []
+                for lab in labs_passaggio:
+                    nomi_aule_lab = frozenset(
+                        aula["nome"] for aula in aule_disp
+                        if "laboratori_consentiti" not in aula or lab["nome"] in aula["laboratori_consentiti"]
+                    )
+                    for gruppo in gruppi:
+                        coppie.append([
+                            conta_combinazioni_libere(lab, gruppo, tipo_gruppo, aule_disp),
+                            len(coppie), lab, gruppo, nomi_aule_lab
+                        ])
+                
+                while coppie:
+                    posizione = min(range(len(coppie)), key=lambda i: (coppie[i][0], coppie[i][1]))
+                    combinazioni_libere, _, lab, gruppo, _ = coppie.pop(posizione)
+                    
+                    # Le combinazioni possono solo diminuire: una coppia che non ne ha fallisce subito
+                    aula_programmata = (
+                        programma_laboratorio(lab, gruppo, tipo_gruppo, aule_disp) if combinazioni_libere else None
+                    )
+                    if aula_programmata is None:
                         fallimenti += 1
                         lab_falliti.append((lab["nome"], gruppo))
+                        continue
+                    successi += 1
+                    
+                    # Il nuovo evento occupa una fascia del gruppo e dell'aula: si aggiornano i conteggi
+                    # delle sole coppie dello stesso gruppo o che possono usare la stessa aula
+                    for coppia in coppie:
+                        if coppia[3] == gruppo or aula_programmata in coppia[4]:
+                            coppia[0] = conta_combinazioni_libere(coppia[2], coppia[3], tipo_gruppo, aule_disp)
             
             st.write(f"Laboratori {tipo_gruppo} programmati con successo: {successi}")
             if fallimenti > 0:
@@ -2542,11 +2941,11 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         
         # Programma prima i laboratori standard
         st.write("#### Programmazione laboratori standard:")
-        succ_std, fail_std = programma_con_priorita(labs_standard_normali, "standard", st.session_state.gruppi_standard, aule_standard)
+        succ_std, fail_std = programma_con_priorita(labs_standard_normali, "standard", gruppi_standard, aule_standard)
         
         # Poi programma i laboratori a capacità ridotta
         st.write("#### Programmazione laboratori a capacità ridotta:")
-        succ_ridotti, fail_ridotti = programma_con_priorita(labs_ridotti_normali, "ridotto", st.session_state.gruppi_ridotti, aule_ridotte)
+        succ_ridotti, fail_ridotti = programma_con_priorita(labs_ridotti_normali, "ridotto", gruppi_ridotti, aule_ridotte)
         
         # FASE 5: Ottimizzazione - Cerca di riempire gli spazi vuoti e riprova con i falliti
         st.write("### Ottimizzazione programmazione:")
@@ -2557,116 +2956,57 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         # Verifica avanzata: controllo che tutti i laboratori siano stati programmati per ogni gruppo
         st.write("### Verifica completezza programmazione:")
         
-        # Crea dizionari per tenere traccia di quali laboratori sono stati programmati per ogni gruppo
-        lab_programmati_standard = {gruppo: set() for gruppo in st.session_state.gruppi_standard}
-        lab_programmati_ridotti = {gruppo: set() for gruppo in st.session_state.gruppi_ridotti}
-        
-        # Analizza gli eventi programmati
-        for evento in st.session_state.programmazione:
-            lab_nome = evento["laboratorio"]
-            gruppo = evento["gruppo"]
-            tipo_gruppo = evento["tipo_gruppo"]
-            
-            if tipo_gruppo == "standard":
-                if gruppo in lab_programmati_standard:
-                    lab_programmati_standard[gruppo].add(lab_nome)
-            else:  # tipo_gruppo == "ridotto"
-                if gruppo in lab_programmati_ridotti:
-                    lab_programmati_ridotti[gruppo].add(lab_nome)
+        # Laboratori programmati per ogni gruppo, già raccolti a ogni inserimento di un evento
+        lab_programmati_standard = {gruppo: lab_programmati_per_gruppo["standard", gruppo] for gruppo in gruppi_standard}
+        lab_programmati_ridotti = {gruppo: lab_programmati_per_gruppo["ridotto", gruppo] for gruppo in gruppi_ridotti}
         
         # Crea set di laboratori che dovrebbero essere programmati per ogni tipo di gruppo
-        nomi_lab_standard = {lab["nome"] for lab in labs_standard}
-        nomi_lab_ridotti = {lab["nome"] for lab in labs_ridotti}
+        nomi_lab_standard = frozenset(lab["nome"] for lab in labs_standard)
+        nomi_lab_ridotti = frozenset(lab["nome"] for lab in labs_ridotti)
         
         # Verifica se ci sono laboratori mancanti per ciascun gruppo
         gruppi_incompleti = []
         lab_mancanti_per_gruppo = {}
+        # Percentuali di completamento per ogni gruppo
+        percentuali_completamento = {}
         
         # Ottieni informazioni sui giorni disponibili
-        inizio = converti_data_italiana(st.session_state.data_inizio)
-        fine = converti_data_italiana(st.session_state.data_fine)
-        giorni_disponibili = crea_giorni_lavorativi(inizio, fine)
-        
-        # Verifica di base dei laboratori mancanti (a prescindere dai giorni)
-        # Utilizzo un approccio più sicuro per evitare errori
-        for gruppo in st.session_state.gruppi_standard:
-            if gruppo in lab_programmati_standard:
-                gruppo_key = f"Standard {gruppo}"
-                lab_mancanti = nomi_lab_standard - lab_programmati_standard[gruppo]
-                if lab_mancanti:
-                    gruppi_incompleti.append(gruppo_key)
-                    lab_mancanti_per_gruppo[gruppo_key] = lab_mancanti
+        giorni_disponibili = crea_giorni_lavorativi(st.session_state.data_inizio, st.session_state.data_fine)
         
-        for gruppo in st.session_state.gruppi_ridotti:
-            if gruppo in lab_programmati_ridotti:
-                gruppo_key = f"Ridotto {gruppo}"
-                lab_mancanti = nomi_lab_ridotti - lab_programmati_ridotti[gruppo]
+        # Laboratori mancanti e percentuale di completamento dei gruppi di un tipo
+        def verifica_gruppi(gruppi, lab_programmati, nomi_lab, etichetta):
+            for gruppo in gruppi:
+                gruppo_key = f"{etichetta} {gruppo}"
+                lab_mancanti = nomi_lab - lab_programmati[gruppo]
                 if lab_mancanti:
                     gruppi_incompleti.append(gruppo_key)
                     lab_mancanti_per_gruppo[gruppo_key] = lab_mancanti
-        
-        # Calcola le percentuali di completamento per ogni gruppo
-        percentuali_completamento = {}
-        
-        # Gruppi standard - aggiunto controllo più sicuro
-        for gruppo in st.session_state.gruppi_standard:
-            if gruppo in lab_programmati_standard:
-                labs_programmati = len(lab_programmati_standard[gruppo])
-                labs_totali = len(nomi_lab_standard)
-                if labs_totali > 0:
-                    percentuali_completamento[f"Standard {gruppo}"] = (labs_programmati / labs_totali) * 100
-                else:
-                    percentuali_completamento[f"Standard {gruppo}"] = 100
-            else:
-                percentuali_completamento[f"Standard {gruppo}"] = 0
-        
-        # Gruppi ridotti - aggiunto controllo più sicuro
-        for gruppo in st.session_state.gruppi_ridotti:
-            if gruppo in lab_programmati_ridotti:
-                labs_programmati = len(lab_programmati_ridotti[gruppo])
-                labs_totali = len(nomi_lab_ridotti)
-                if labs_totali > 0:
-                    percentuali_completamento[f"Ridotto {gruppo}"] = (labs_programmati / labs_totali) * 100
+                if nomi_lab:
+                    percentuali_completamento[gruppo_key] = (len(lab_programmati[gruppo]) / len(nomi_lab)) * 100
                 else:
-                    percentuali_completamento[f"Ridotto {gruppo}"] = 100
-            else:
-                percentuali_completamento[f"Ridotto {gruppo}"] = 0
+                    percentuali_completamento[gruppo_key] = 100
+        
+        verifica_gruppi(gruppi_standard, lab_programmati_standard, nomi_lab_standard, "Standard")
+        verifica_gruppi(gruppi_ridotti, lab_programmati_ridotti, nomi_lab_ridotti, "Ridotto")
         
         # Crea una visualizzazione delle percentuali di completamento
         st.write("#### Percentuali di completamento della programmazione:")
         
-        # Prepara i dati per il grafico complessivo
-        gruppi_labels = []
-        percentuali_values = []
-        colori = []
-        
-        # Aggiungi gruppi standard
-        for gruppo in sorted(st.session_state.gruppi_standard):
-            gruppi_labels.append(f"Standard {gruppo}")
-            percentuali_values.append(percentuali_completamento[f"Standard {gruppo}"])
-            
-            # Scegli il colore in base alla percentuale
-            perc = percentuali_completamento[f"Standard {gruppo}"]
-            if perc < 50:
-                colori.append("red")
-            elif perc < 100:
-                colori.append("gold")
-            else:
-                colori.append("green")
-        
-        # Aggiungi gruppi ridotti
-        for gruppo in sorted(st.session_state.gruppi_ridotti):
-            gruppi_labels.append(f"Ridotto {gruppo}")
-            percentuali_values.append(percentuali_completamento[f"Ridotto {gruppo}"])
-            
-            # Scegli il colore in base alla percentuale
-            perc = percentuali_completamento[f"Ridotto {gruppo}"]
-            if perc < 50:
-                colori.append("red")
-            elif perc < 100:
-                colori.append("gold")
-            else:
-                colori.append("green")
+        # Prepara i dati per il grafico complessivo: prima i gruppi standard, poi i ridotti
+        gruppi_standard_ordinati = sorted(gruppi_standard)
+        gruppi_ridotti_ordinati = sorted(gruppi_ridotti)
+        gruppi_labels = (
+            [f"Standard {gruppo}" for gruppo in gruppi_standard_ordinati] +
+            [f"Ridotto {gruppo}" for gruppo in gruppi_ridotti_ordinati]
+        )
+        percentuali_values = [percentuali_completamento[gruppo_key] for gruppo_key in gruppi_labels]
+        
+        # Livello di completamento di ogni gruppo (0: sotto il 50%, 1: sotto il 100%, 2: completo),
+        # usato sia per il colore delle barre sia per l'indicatore nelle colonne
+        percentuali_array = np.array(percentuali_values, dtype=float)
+        livelli = np.select([percentuali_array < 50, percentuali_array < 100], [0, 1], default=2).tolist()
+        colori = [("red", "gold", "green")[livello] for livello in livelli]
+        indicatori = [("🔴", "🟡", "🟢")[livello] for livello in livelli]  # Rosso, giallo, verde
         
         # Crea grafico a barre orizzontali per le percentuali di completamento
         fig = go.Figure(go.Bar(
@@ -2691,34 +3031,16 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         # Crea due colonne, una per i gruppi standard e una per i gruppi ridotti
         col1, col2 = st.columns(2)
         
+        # Mostra l'indicatore con il colore appropriato per ogni gruppo
+        numero_standard = len(gruppi_standard_ordinati)
         with col1:
             st.write("**Gruppi Standard:**")
-            for gruppo in sorted(st.session_state.gruppi_standard):
-                perc = percentuali_completamento[f"Standard {gruppo}"]
-                # Scegli il colore in base alla percentuale
-                if perc < 50:
-                    color = "🔴"  # Rosso
-                elif perc < 100:
-                    color = "🟡"  # Giallo
-                else:
-                    color = "🟢"  # Verde
-                
-                # Mostra l'indicatore con il colore appropriato
+            for gruppo, perc, color in zip(gruppi_standard_ordinati, percentuali_values, indicatori):
                 st.write(f"{color} Gruppo {gruppo}: {perc:.1f}% completato")
         
         with col2:
             st.write("**Gruppi Ridotti:**")
-            for gruppo in sorted(st.session_state.gruppi_ridotti):
-                perc = percentuali_completamento[f"Ridotto {gruppo}"]
-                # Scegli il colore in base alla percentuale
-                if perc < 50:
-                    color = "🔴"  # Rosso
-                elif perc < 100:
-                    color = "🟡"  # Giallo
-                else:
-                    color = "🟢"  # Verde
-                
-                # Mostra l'indicatore con il colore appropriato
+            for gruppo, perc, color in zip(gruppi_ridotti_ordinati, percentuali_values[numero_standard:], indicatori[numero_standard:]):
                 st.write(f"{color} Gruppo {gruppo}: {perc:.1f}% completato")
         
         # Mostra solo un avviso semplice se il numero di giorni è inferiore al minimo necessario (14)
@@ -2746,25 +3068,32 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             # Strategie di ottimizzazione avanzate potrebbero essere implementate qui
             # Ad esempio, spostare eventi per fare spazio, considerare aule alternative, ecc.
             
-            # Per ora, identifichiamo e mostriamo gli slot non utilizzati
+            # Per ora, identifichiamo e mostriamo gli slot non utilizzati: (data, aula, fascia) liberi
+            # nello stesso ordine di scansione, dalle maschere di occupazione aggiornate
+            bit_fasce_singole = np.array([SLOT_BITS[fascia] for fascia in FASCE_SINGOLE], dtype=np.uint8)
+            slot_liberi = (occupazione_aule[:, :, np.newaxis] & bit_fasce_singole) == 0
+            totale_slot_liberi = int(slot_liberi.sum())
+            
+            # Solo i primi 10 slot vengono mostrati: si cercano data per data fino ad averne abbastanza
             slots_liberi = []
-            for data in date_disponibili:
-                for aula in st.session_state.aule:
-                    for fascia in ["08:30-11:00", "11:10-13:30", "14:30-17:00"]:
-                        if not occupazione_aule[data][aula["nome"]][fascia]:
-                            slots_liberi.append(f"{data} - {fascia} - Aula {aula['nome']}")
+            for d in range(slot_liberi.shape[0]):
+                for a, f in np.argwhere(slot_liberi[d])[:10 - len(slots_liberi)]:
+                    slots_liberi.append(f"{date_disponibili[d]} - {FASCE_SINGOLE[f]} - Aula {aule[a]['nome']}")
+                if len(slots_liberi) == 10:
+                    break
             
             if slots_liberi:
                 with st.expander("Slot liberi disponibili"):
-                    for slot in slots_liberi[:10]:  # Mostra i primi 10 slot
+                    for slot in slots_liberi:  # Mostra i primi 10 slot
                         st.write(f"- {slot}")
-                    if len(slots_liberi) > 10:
-                        st.write(f"...e altri {len(slots_liberi) - 10} slot")
+                    if totale_slot_liberi > 10:
+                        st.write(f"...e altri {totale_slot_liberi - 10} slot")
             else:
                 st.write("Non ci sono slot liberi disponibili.")
         
+        sincronizza_programmazione()
         salva_dati_sessione()
-        st.write(f"Totale eventi programmati: {len(st.session_state.programmazione)}")
+        st.write(f"Totale eventi programmati: {len(eventi_canale)}")
         return True
     
     # Pulsanti per gestire la programmazione
@@ -2792,8 +3121,8 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             if canale_selezionato in st.session_state.programmazione_per_canale:
                 st.session_state.programmazione_per_canale[canale_selezionato] = []
             
-            # Per retrocompatibilità, cancella anche la programmazione globale se necessario
-            st.session_state.programmazione = []
+            # Ricalcola la vista globale a partire dai canali
+            sincronizza_programmazione()
             
             st.success(f"Programmazione per il canale {canale_selezionato} cancellata!")
             salva_dati_sessione()
@@ -2808,7 +3137,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         vista = st.radio("Visualizza per:", ["Data", "Laboratorio", "Aula", "Gruppo"])
         
         # Crea DataFrame per la programmazione del canale selezionato
-        df_programmazione = pd.DataFrame(st.session_state.programmazione_per_canale[canale_selezionato])
+        df_programmazione = dataframe_programmazione(canale_selezionato, st.session_state.programmazione_per_canale[canale_selezionato])
     # Per retrocompatibilità, mostriamo anche la programmazione globale se non c'è quella per canale
     elif st.session_state.programmazione:
         st.subheader("Programmazione Corrente (globale)")
@@ -2817,7 +3146,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         vista = st.radio("Visualizza per:", ["Data", "Laboratorio", "Aula", "Gruppo"])
         
         # Crea DataFrame per la programmazione
-        df_programmazione = pd.DataFrame(st.session_state.programmazione)
+        df_programmazione = dataframe_programmazione("globale", st.session_state.programmazione)
     else:
         # Nessuna programmazione da visualizzare
         st.info("Non è stata ancora generata alcuna programmazione per questo canale.")
@@ -2827,41 +3156,37 @@ elif st.session_state.sezione_corrente == 'Programmazione':
     if df_programmazione is not None:
         
         if vista == "Data":
-            # Raggruppa per data
-            for data in sorted(df_programmazione["data"].unique()):
+            # Raggruppa per data (un solo partizionamento invece di un filtro per ogni valore)
+            for data, df_giorno in df_programmazione.groupby("data", sort=True):
                 st.write(f"### {data}")
                 
-                df_giorno = df_programmazione[df_programmazione["data"] == data]
                 df_giorno = df_giorno.sort_values(by=["ora_inizio", "aula"])
                 
                 st.dataframe(df_giorno[["ora_inizio", "ora_fine", "laboratorio", "aula", "gruppo"]], use_container_width=True)
         
         elif vista == "Laboratorio":
             # Raggruppa per laboratorio
-            for lab in sorted(df_programmazione["laboratorio"].unique()):
+            for lab, df_lab in df_programmazione.groupby("laboratorio", sort=True):
                 st.write(f"### {lab}")
                 
-                df_lab = df_programmazione[df_programmazione["laboratorio"] == lab]
                 df_lab = df_lab.sort_values(by=["data", "ora_inizio"])
                 
                 st.dataframe(df_lab[["data", "ora_inizio", "ora_fine", "aula", "gruppo"]], use_container_width=True)
         
         elif vista == "Aula":
             # Raggruppa per aula
-            for aula in sorted(df_programmazione["aula"].unique()):
+            for aula, df_aula in df_programmazione.groupby("aula", sort=True):
                 st.write(f"### {aula}")
                 
-                df_aula = df_programmazione[df_programmazione["aula"] == aula]
                 df_aula = df_aula.sort_values(by=["data", "ora_inizio"])
                 
                 st.dataframe(df_aula[["data", "ora_inizio", "ora_fine", "laboratorio", "gruppo"]], use_container_width=True)
         
         elif vista == "Gruppo":
             # Raggruppa per gruppo
-            for gruppo in sorted(df_programmazione["gruppo"].unique()):
+            for gruppo, df_gruppo in df_programmazione.groupby("gruppo", sort=True):
                 st.write(f"### {gruppo}")
                 
-                df_gruppo = df_programmazione[df_programmazione["gruppo"] == gruppo]
                 df_gruppo = df_gruppo.sort_values(by=["data", "ora_inizio"])
                 
                 st.dataframe(df_gruppo[["data", "ora_inizio", "ora_fine", "laboratorio", "aula"]], use_container_width=True)
@@ -2869,12 +3194,7 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         # Pulsante per eliminare un evento
         st.subheader("Elimina Evento")
         
-        # Crea una chiave univoca per ogni evento
-        df_programmazione["evento_id"] = df_programmazione.apply(
-            lambda row: f"{row['data']} - {row['ora_inizio']} - {row['laboratorio']} - {row['aula']} - {row['gruppo']}", 
-            axis=1
-        )
-        
+        # La chiave univoca di ogni evento (evento_id) è calcolata insieme al DataFrame in cache
         evento_da_eliminare = st.selectbox("Seleziona evento da eliminare:", 
                                          df_programmazione["evento_id"].tolist())
         
@@ -2883,10 +3203,15 @@ elif st.session_state.sezione_corrente == 'Programmazione':
             data, ora, lab, aula, gruppo = parti_evento
             
             if st.button("Elimina Evento"):
-                # Rimuovi dalla programmazione specifica del canale
-                if canale_selezionato in st.session_state.programmazione_per_canale:
-                    st.session_state.programmazione_per_canale[canale_selezionato] = [
-                        e for e in st.session_state.programmazione_per_canale[canale_selezionato] 
+                # Rimuovi dalla programmazione del canale selezionato o, se è visualizzata
+                # la programmazione globale, da quella di ogni canale
+                if st.session_state.programmazione_per_canale.get(canale_selezionato):
+                    canali_da_aggiornare = [canale_selezionato]
+                else:
+                    canali_da_aggiornare = list(st.session_state.programmazione_per_canale)
+                for canale in canali_da_aggiornare:
+                    st.session_state.programmazione_per_canale[canale] = [
+                        e for e in st.session_state.programmazione_per_canale[canale] 
                         if not (e["data"] == data and 
                                 e["ora_inizio"] == ora and 
                                 e["laboratorio"] == lab and 
@@ -2894,15 +3219,8 @@ elif st.session_state.sezione_corrente == 'Programmazione':
                                 e["gruppo"] == gruppo)
                     ]
                 
-                # Per retrocompatibilità, rimuovi anche dalla programmazione globale
-                st.session_state.programmazione = [
-                    e for e in st.session_state.programmazione 
-                    if not (e["data"] == data and 
-                            e["ora_inizio"] == ora and 
-                            e["laboratorio"] == lab and 
-                            e["aula"] == aula and 
-                            e["gruppo"] == gruppo)
-                ]
+                # Ricalcola la vista globale a partire dai canali
+                sincronizza_programmazione()
                 
                 st.success("Evento eliminato con successo!")
                 salva_dati_sessione()
@@ -2934,34 +3252,30 @@ elif st.session_state.sezione_corrente == 'Programmazione':
         col1, col2 = st.columns(2)
         
         with col1:
-            if st.button("Esporta in Excel (Dettagliato)"):
-                # Prepara DataFrame per export dettagliato
-                df_export = df_programmazione.drop(columns=["evento_id"])
-                
-                # Ordina per data e ora
-                df_export = df_export.sort_values(by=["data", "ora_inizio", "aula"])
-                
-                # Converti in Excel
-                excel_data = converti_a_excel(df_export)
-                
-                st.download_button(
-                    label="Download Excel Dettagliato",
-                    data=excel_data,
-                    file_name="programmazione_laboratori_dettagliata.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            # Prepara DataFrame per export dettagliato
+            df_export = df_programmazione.drop(columns=["evento_id"])
+            
+            # Ordina per data e ora
+            df_export = df_export.sort_values(by=["data", "ora_inizio", "aula"])
+            
+            pulsante_esportazione(
+                "Esporta in Excel (Dettagliato)",
+                lambda: converti_a_excel(df_export),
+                file_name="programmazione_laboratori_dettagliata.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                chiave="excel_programmazione_dettagliata",
+                etichetta_download="Download Excel Dettagliato"
+            )
         
         with col2:
-            if st.button("Esporta in Excel (Formattato)"):
-                # Converti il dataframe formattato in Excel
-                excel_data = converti_a_excel(df_formatted)
-                
-                st.download_button(
-                    label="Download Excel Formattato",
-                    data=excel_data,
-                    file_name="programmazione_laboratori.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            pulsante_esportazione(
+                "Esporta in Excel (Formattato)",
+                lambda: converti_a_excel(df_formatted),
+                file_name="programmazione_laboratori.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                chiave="excel_programmazione_formattata",
+                etichetta_download="Download Excel Formattato"
+            )
         
         # Statistiche
         st.subheader("Statistiche Programmazione")
@@ -3083,6 +3397,18 @@ elif st.session_state.sezione_corrente == 'Presenze':
 elif st.session_state.sezione_corrente == 'Backup':
     st.header("Gestione Backup", anchor="section-backup")
     backup_interface()  # Richiama l'interfaccia dal modulo backup_manager
+    
+    # Esportazione leggibile dei dati della sessione (il salvataggio automatico usa pickle)
+    st.subheader("Esporta dati sessione")
+    try:
+        st.download_button(
+            label="Esporta sessione in JSON",
+            data=serializza_json(dati_sessione_correnti()),
+            file_name="sessione_simplanner.json",
+            mime="application/json"
+        )
+    except TypeError as e:
+        st.error(f"Errore nell'esportazione dei dati: {str(e)}")
 
 # Funzione principale dell'applicazione
 def main():
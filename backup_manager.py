@@ -36,7 +36,8 @@ def get_session_data():
     keys_to_save = [
         'studenti', 'laboratori', 'num_macrogruppi', 'anno_corso', 'anno_accademico', 'sede_cdl', 
         'gruppi_standard', 'gruppi_ridotti', 'aule', 'data_inizio', 'data_fine', 
-        'programmazione', 'device_giacenze', 'device_requisiti_lab', 'presenze_studenti'
+        'programmazione', 'programmazione_per_canale', 'device_giacenze', 'device_requisiti_lab',
+        'presenze_studenti'
     ]
     
     for key in keys_to_save:
@@ -0,0 +1,131 @@
+import numpy as np
+
+# numba è dichiarato tra le dipendenze: se per qualche motivo non è installato
+# la ricerca usa la versione NumPy, con lo stesso punteggio e la stessa regola di parità
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def punteggio_combinazione(eventi_stesso_giorno, efficienza, posizione_data, indice_fascia):
+    """Punteggio di ottimizzazione di una combinazione (più basso è meglio); efficienza può essere un array di aule.
+    Diamo priorità a:
+    1. Date che già hanno eventi (per compattare)
+    2. Efficienza dell'utilizzo dell'aula
+    3. Date precedenti (per completare prima le prime settimane)
+    4. Prime fasce della giornata"""
+    return (
+        - eventi_stesso_giorno * 10  # Priorità alta a giorni già occupati
+        - efficienza * 5             # Priorità a utilizzo efficiente dell'aula
+        + posizione_data * 2         # Leggera penalità per date più avanti
+        + indice_fascia              # Leggera priorità alle prime fasce della giornata
+    )
+
+
+def cerca_combinazione_numpy(posizioni_date, eventi_date, fasce, colonne_aule, efficienza_aule,
+                             occupazione_aule, occupazione_gruppi, riga_gruppo, giornata_piena):
+    """Cerca la combinazione data-fascia-aula libera con il punteggio più basso (a parità vale la prima trovata).
+    posizioni_date ed eventi_date indicano per ogni data la riga nelle maschere di occupazione e gli eventi già
+    programmati; fasce contiene le coppie (bit della fascia, indice della fascia nella giornata) e
+    giornata_piena è il valore di una maschera con tutte le fasce occupate.
+    Restituisce (punteggio, indice data, indice fascia, indice aula) riferiti alle sequenze ricevute; -1 se non ce ne sono."""
+    punteggio_migliore = np.inf
+    migliore = (-1, -1, -1)
+    for i, (posizione_data, eventi_stesso_giorno) in enumerate(zip(posizioni_date, eventi_date)):
+        # Giornata già piena per il gruppo o per tutte le aule compatibili: nessuna fascia è libera
+        if occupazione_gruppi[posizione_data, riga_gruppo] == giornata_piena:
+            continue
+        occupazione_giorno = occupazione_aule[posizione_data, colonne_aule]
+        if (occupazione_giorno == giornata_piena).all():
+            continue
+
+        for j, (bit, indice_fascia) in enumerate(fasce):
+            # Se il gruppo è già impegnato in questa fascia nessuna aula è utilizzabile
+            if occupazione_gruppi[posizione_data, riga_gruppo] & bit:
+                continue
+
+            # Aule compatibili libere in questa fascia, verificate tutte insieme
+            aule_libere = (occupazione_giorno & bit) == 0
+            if not aule_libere.any():
+                continue
+
+            # Punteggio di tutte le aule in un'unica operazione; le aule occupate sono escluse
+            punteggi = punteggio_combinazione(eventi_stesso_giorno, efficienza_aule, posizione_data, indice_fascia)
+            punteggi[~aule_libere] = np.inf
+
+            # argmin restituisce la prima aula a parità di punteggio, come il confronto stretto
+            # mantiene la prima combinazione trovata
+            posizione_aula = int(punteggi.argmin())
+            punteggio = float(punteggi[posizione_aula])
+            if punteggio < punteggio_migliore:
+                punteggio_migliore = punteggio
+                migliore = (i, j, posizione_aula)
+    return (punteggio_migliore,) + migliore
+
+
+def _cerca_combinazione_cicli(posizioni_date, eventi_date, bit_fasce, indici_fasce, colonne_aule, efficienza_aule,
+                              occupazione_aule, occupazione_gruppi, riga_gruppo, giornata_piena):
+    """Stessa ricerca di cerca_combinazione_numpy scritta con soli array e cicli semplici, per numba"""
+    punteggio_migliore = np.inf
+    data_migliore = -1
+    fascia_migliore = -1
+    aula_migliore = -1
+    for i in range(posizioni_date.shape[0]):
+        d = posizioni_date[i]
+        # Giornata già piena per il gruppo o per tutte le aule compatibili: nessuna fascia è libera
+        if occupazione_gruppi[d, riga_gruppo] == giornata_piena:
+            continue
+        aule_piene = True
+        for k in range(colonne_aule.shape[0]):
+            if occupazione_aule[d, colonne_aule[k]] != giornata_piena:
+                aule_piene = False
+                break
+        if aule_piene:
+            continue
+
+        for j in range(bit_fasce.shape[0]):
+            bit = bit_fasce[j]
+            # Se il gruppo è già impegnato in questa fascia nessuna aula è utilizzabile
+            if occupazione_gruppi[d, riga_gruppo] & bit:
+                continue
+            for k in range(colonne_aule.shape[0]):
+                if occupazione_aule[d, colonne_aule[k]] & bit:
+                    continue
+                punteggio = punteggio_combinazione(eventi_date[i], efficienza_aule[k], d, indici_fasce[j])
+                # Confronto stretto: a parità resta la prima combinazione trovata
+                if punteggio < punteggio_migliore:
+                    punteggio_migliore = punteggio
+                    data_migliore = i
+                    fascia_migliore = j
+                    aula_migliore = k
+    return punteggio_migliore, data_migliore, fascia_migliore, aula_migliore
+
+
+if numba is not None:
+    # La compilazione avviene alla prima chiamata e viene conservata su disco (cache=True)
+    punteggio_combinazione = numba.njit(cache=True)(punteggio_combinazione)
+    _cerca_combinazione_compilata = numba.njit(cache=True)(_cerca_combinazione_cicli)
+
+
+def cerca_combinazione_compilata(posizioni_date, eventi_date, fasce, colonne_aule, efficienza_aule,
+                                 occupazione_aule, occupazione_gruppi, riga_gruppo, giornata_piena):
+    """Versione compilata con numba di cerca_combinazione_numpy (stessi argomenti e stesso risultato)"""
+    if not len(posizioni_date) or not len(fasce):
+        return (np.inf, -1, -1, -1)
+    punteggio, i_data, i_fascia, i_aula = _cerca_combinazione_compilata(
+        np.asarray(posizioni_date, dtype=np.int64),
+        np.asarray(eventi_date, dtype=np.int64),
+        np.array([bit for bit, _ in fasce], dtype=occupazione_aule.dtype),
+        np.array([indice_fascia for _, indice_fascia in fasce], dtype=np.int64),
+        np.asarray(colonne_aule, dtype=np.intp),
+        np.asarray(efficienza_aule, dtype=np.float64),
+        occupazione_aule,
+        occupazione_gruppi,
+        riga_gruppo,
+        giornata_piena
+    )
+    return (float(punteggio), int(i_data), int(i_fascia), int(i_aula))
+
+
+cerca_combinazione_migliore = cerca_combinazione_compilata if numba is not None else cerca_combinazione_numpy
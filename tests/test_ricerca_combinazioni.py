@@ -0,0 +1,105 @@
+import importlib.util
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import ricerca_combinazioni
+from ricerca_combinazioni import cerca_combinazione_numpy
+
+GIORNATA_PIENA = 0b111
+
+IMPLEMENTAZIONI = [cerca_combinazione_numpy]
+if ricerca_combinazioni.numba is not None:
+    IMPLEMENTAZIONI.append(ricerca_combinazioni.cerca_combinazione_compilata)
+
+
+def cerca_combinazione_riferimento(posizioni_date, eventi_date, fasce, colonne_aule, efficienza_aule,
+                                   occupazione_aule, occupazione_gruppi, riga_gruppo):
+    """Scansione diretta data -> fascia -> aula, con confronto stretto sul punteggio"""
+    punteggio_migliore = float("inf")
+    migliore = (-1, -1, -1)
+    for i, (d, eventi) in enumerate(zip(posizioni_date, eventi_date)):
+        for j, (bit, indice_fascia) in enumerate(fasce):
+            if occupazione_gruppi[d, riga_gruppo] & bit:
+                continue
+            for k, colonna in enumerate(colonne_aule):
+                if occupazione_aule[d, colonna] & bit:
+                    continue
+                punteggio = - eventi * 10 - efficienza_aule[k] * 5 + d * 2 + indice_fascia
+                if punteggio < punteggio_migliore:
+                    punteggio_migliore = punteggio
+                    migliore = (i, j, k)
+    return (punteggio_migliore,) + migliore
+
+
+@pytest.fixture
+def occupazione():
+    # 4 date, 3 aule, 2 gruppi
+    occupazione_aule = np.array([
+        [GIORNATA_PIENA, GIORNATA_PIENA, GIORNATA_PIENA],  # data 0: tutte le aule piene
+        [0b001, 0b011, 0b000],
+        [0b000, 0b000, 0b100],
+        [0b000, 0b000, 0b000],
+    ], dtype=np.uint8)
+    occupazione_gruppi = np.array([
+        [0b000, 0b000],
+        [0b000, GIORNATA_PIENA],  # data 1: giornata piena per il secondo gruppo
+        [0b001, 0b000],
+        [0b000, 0b000],
+    ], dtype=np.uint8)
+    return occupazione_aule, occupazione_gruppi
+
+
+@pytest.mark.parametrize("cerca", IMPLEMENTAZIONI)
+@pytest.mark.parametrize("riga_gruppo", [0, 1])
+@pytest.mark.parametrize("eventi_date", [[0, 0, 0, 0], [0, 1, 1, 0], [3, 0, 0, 2]])
+def test_stessa_combinazione_della_scansione_diretta(cerca, occupazione, riga_gruppo, eventi_date):
+    occupazione_aule, occupazione_gruppi = occupazione
+    argomenti = (
+        [0, 1, 2, 3],
+        eventi_date,
+        [(0b001, 0), (0b010, 1), (0b100, 2)],
+        np.array([2, 0, 1], dtype=np.intp),
+        # Le prime due aule hanno la stessa efficienza: a parità vale la prima
+        np.array([0.5, 0.5, 0.8]),
+        occupazione_aule,
+        occupazione_gruppi,
+        riga_gruppo,
+    )
+
+    assert cerca(*argomenti, GIORNATA_PIENA) == cerca_combinazione_riferimento(*argomenti)
+
+
+@pytest.mark.parametrize("cerca", IMPLEMENTAZIONI)
+@pytest.mark.parametrize("eventi_date, occupata, atteso", [
+    # Nessun evento: vince la prima data (0 - 0.5 * 5 = -2.5) e, a parità di efficienza, la prima aula
+    ([0, 0], 0b000, (-2.5, 0, 0, 0)),
+    # Un evento già nel secondo giorno pesa più della data successiva: -10 - 2.5 + 2 = -10.5 contro -2.5
+    ([0, 1], 0b000, (-10.5, 1, 0, 0)),
+    # Prima aula occupata il secondo giorno: a parità di punteggio resta solo la seconda
+    ([0, 1], 0b001, (-10.5, 1, 0, 1)),
+])
+def test_punteggio_calcolato_a_mano(cerca, eventi_date, occupata, atteso):
+    occupazione_aule = np.array([[0b000, 0b000], [occupata, 0b000]], dtype=np.uint8)
+    occupazione_gruppi = np.zeros((2, 1), dtype=np.uint8)
+
+    assert cerca(
+        [0, 1], eventi_date, [(0b001, 0)], np.array([0, 1], dtype=np.intp), np.array([0.5, 0.5]),
+        occupazione_aule, occupazione_gruppi, 0, GIORNATA_PIENA
+    ) == atteso
+
+
+@pytest.mark.parametrize("cerca", IMPLEMENTAZIONI)
+def test_nessuna_combinazione_libera(cerca, occupazione):
+    occupazione_aule, occupazione_gruppi = occupazione
+
+    assert cerca(
+        [0], [0], [(0b001, 0)], np.array([0, 1, 2], dtype=np.intp), np.array([0.5, 0.5, 0.5]),
+        occupazione_aule, occupazione_gruppi, 0, GIORNATA_PIENA
+    ) == (float("inf"), -1, -1, -1)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("numba") is None, reason="numba non installato")
+def test_ricerca_compilata_in_uso():
+    assert ricerca_combinazioni.cerca_combinazione_migliore is ricerca_combinazioni.cerca_combinazione_compilata